@@ -30,5 +30,7 @@ setup(name='data_quality_tool',
       packages=setuptools.find_packages('src'),
       zip_safe=False, install_requires=['pandas', 'flask', 'sqlalchemy', 'pyodbc',
                                         'flask-sqlalchemy', 'flask-cors', 'cherrypy', 'paste',
-                                        'flask-migrate', 'flask-script', 'flask-alembic', 'tornado']
+                                        'flask-migrate', 'flask-script', 'flask-alembic', 'tornado',
+                                        'numpy'],
+      extras_require={'msgpack': ['msgpack']},
       )
@@ -61,7 +61,8 @@ try:
     whooshee.init_app(app)
     whooshee.app = app
     app.logger.info('Initialized whooshee.')
-    if not os.path.exists(os.path.join(app.config['WHOOSHEE_DIR'], 'category')):
+    if not all(os.path.exists(os.path.join(app.config['WHOOSHEE_DIR'], index_subdir))
+           for index_subdir in ('category', 'value_label')):
         with app.app_context():
             whooshee.reindex()
         app.logger.info('Reindexed')
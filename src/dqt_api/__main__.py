@@ -55,7 +55,8 @@ def prepare_config(debug=False, whooshee_dir=False, skip_init=False):
         whooshee.init_app(app)
         whooshee.app = app  # needs to be done manually
         app.logger.info('Initialized whooshee.')
-        if not os.path.exists(os.path.join(app.config['WHOOSHEE_DIR'], 'category')):
+        if not all(os.path.exists(os.path.join(app.config['WHOOSHEE_DIR'], index_subdir))
+               for index_subdir in ('category', 'value_label')):
             with app.app_context():
                 whooshee.reindex()
             app.logger.info('Reindexed')
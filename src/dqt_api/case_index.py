@@ -0,0 +1,315 @@
+"""
+Resident, vectorized index of `Variable` rows for evaluating filters and counting cases.
+
+Each distinct (item, value) pair owns a contiguous run of case positions, so a filter is
+a union of runs and the number of selected cases having each pair is a difference of
+prefix sums over the selection mask.
+
+The runs are sorted posting lists with `pair_start` as their offset table: on nodes with little
+memory (`CASE_INDEX_MMAP`), the arrays are written to one file in `BASE_DIR` and memory-mapped
+(see `build_case_index_file`), so pages are shared between processes and only read when used.
+"""
+import json
+import os
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import func, select
+
+from dqt_api import db, models
+from dqt_api.catalog import get_data_generation
+
+FETCH_SIZE = 100_000
+INDEX_ARRAYS = ('cases', 'case_pos', 'pair_item', 'pair_value', 'pair_numeric', 'pair_start')
+FILE_MAGIC = b'DQTCIDX1'
+ALIGNMENT = 64
+HEADER_BYTES = 4096  # reserved for magic, header length and header, so arrays can be written first
+
+
+class CaseIndex(object):
+    """
+    cases: sorted case ids (all cases in `Variable`)
+    case_pos: position in `cases` for each (item, value, case) entry, grouped by pair
+    pair_item, pair_value: item and value id of each pair, sorted by (item, value)
+    pair_numeric: `Value.name_numeric` of each pair (nan if not numeric)
+    pair_start: entries of pair `p` are `case_pos[pair_start[p]:pair_start[p + 1]]`
+    """
+    __slots__ = ('generation', 'cases', 'case_pos', 'pair_item', 'pair_value', 'pair_numeric', 'pair_start')
+
+    def __init__(self, generation, cases, case_pos, pair_item, pair_value, pair_numeric, pair_start):
+        self.generation = generation
+        self.cases = cases
+        self.case_pos = case_pos
+        self.pair_item = pair_item
+        self.pair_value = pair_value
+        self.pair_numeric = pair_numeric
+        self.pair_start = pair_start
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, attr in zip(self.__slots__, state):
+            setattr(self, name, attr)
+
+    @property
+    def size(self):
+        return len(self.cases)
+
+    def item_pairs(self, item_id):
+        """Range of pairs (lo, hi) belonging to `item_id`"""
+        return (int(np.searchsorted(self.pair_item, item_id, side='left')),
+                int(np.searchsorted(self.pair_item, item_id, side='right')))
+
+    def select_pairs(self, item_id, val):
+        """Boolean selection over the item's pairs for a filter value as used by `parse_arg_list`:
+            'low~high' (either may be empty) for numeric values, otherwise '_'-separated value ids
+        :raises ValueError: if `val` cannot be parsed
+        """
+        lo, hi = self.item_pairs(item_id)
+        if '~' in val:
+            low, high = val.split('~')[:2]
+            numeric = self.pair_numeric[lo:hi]
+            selected = np.ones(hi - lo, dtype=bool)
+            if low:
+                selected &= numeric >= float(low)
+            if high:
+                selected &= numeric <= float(high)
+            return lo, hi, selected  # neither: any value for item
+        value_ids = np.array([int(v) for v in val.split('_')], dtype=np.int64)
+        return lo, hi, np.isin(self.pair_value[lo:hi], value_ids)
+
+    def filter_mask(self, item_id, val):
+        """Boolean mask over `cases` for a single filter"""
+        lo, hi, selected = self.select_pairs(item_id, val)
+        mask = np.zeros(self.size, dtype=bool)
+        counts = np.diff(self.pair_start[lo:hi + 1])
+        entries = self.case_pos[self.pair_start[lo]:self.pair_start[hi]]
+        mask[entries[np.repeat(selected, counts)]] = True
+        return mask
+
+    def mask(self, arg_list):
+        """Boolean mask over `cases` for all filters (`None` if there are no filters)
+
+        :param arg_list: ((item_id, value), ...) as passed to `parse_arg_list`
+        """
+        mask = None
+        for key, val in arg_list:
+            item_mask = self.filter_mask(int(key), val)
+            mask = item_mask if mask is None else mask & item_mask
+        return mask
+
+    def filter_positions(self, item_id, val):
+        """Sorted case positions for a single filter: the union of the selected pairs' postings"""
+        lo, hi, selected = self.select_pairs(item_id, val)
+        postings = [self.case_pos[self.pair_start[p]:self.pair_start[p + 1]] for p in np.flatnonzero(selected) + lo]
+        if len(postings) == 1:
+            return postings[0]
+        if not postings:
+            return np.empty(0, dtype=self.case_pos.dtype)
+        return np.unique(np.concatenate(postings))
+
+    def positions(self, arg_list):
+        """Sorted case positions for all filters (`None` if there are no filters), intersecting the shortest first"""
+        res = None
+        for positions in sorted((self.filter_positions(int(key), val) for key, val in arg_list), key=len):
+            res = positions if res is None else intersect_sorted(res, positions)
+            if len(res) == 0:
+                break
+        return res
+
+    def pair_counts(self, mask=None, lo=0, hi=None):
+        """Number of selected cases having each pair (only pairs `lo:hi`, if specified)"""
+        hi = len(self.pair_item) if hi is None else hi
+        starts = self.pair_start[lo:hi + 1]
+        if mask is None:
+            return np.diff(starts)
+        selected = np.concatenate(([0], np.cumsum(mask[self.case_pos[starts[0]:starts[-1]]], dtype=np.int64)))
+        return selected[starts[1:] - starts[0]] - selected[starts[:-1] - starts[0]]
+
+    def numeric_histogram(self, item_id, edges, mask=None):
+        """Selected cases for a numeric item counted into bins `edges[i] <= x < edges[i + 1]`
+        (values outside the edges are counted in the first/last bin)
+        """
+        lo, hi = self.item_pairs(item_id)
+        numeric = self.pair_numeric[lo:hi]
+        is_numeric = ~np.isnan(numeric)
+        bins = np.searchsorted(edges, numeric[is_numeric], side='right') - 1
+        bins = np.clip(bins, 0, len(edges) - 2)
+        counts = self.pair_counts(mask, lo, hi)[is_numeric]
+        return np.bincount(bins, weights=counts, minlength=len(edges) - 1).astype(np.int64)
+
+    def value_counts(self, item_ids, mask=None):
+        """Selected cases for each value of the items: {item_id: {value_id: count}}"""
+        res = {}
+        for item_id in item_ids:
+            lo, hi = self.item_pairs(item_id)
+            res[item_id] = dict(zip(self.pair_value[lo:hi].tolist(), self.pair_counts(mask, lo, hi).tolist()))
+        return res
+
+    def case_ids(self, mask):
+        return self.cases[mask]
+
+
+class MappedCaseIndex(CaseIndex):
+    """Case index memory-mapped from a file written by `build_case_index_file`: pickled as its path"""
+    __slots__ = ('path',)
+
+    def __init__(self, path, *args):
+        self.path = path
+        super().__init__(*args)
+
+    def __reduce__(self):
+        return open_case_index, (self.path,)
+
+
+def intersect_sorted(a, b):
+    """Intersection of sorted, unique arrays: binary search for each element of the shorter in the longer"""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return a
+    idx = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[idx] == a]
+
+
+def _aligned(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def build_case_index_file(path, generation=None):
+    """Build the case index straight into a file (atomically) for memory-mapping, streaming `Variable` rows
+    in (item, value, case) order so that only one batch of entries is in memory at a time.
+
+    Layout: magic, header length, JSON header with the generation and each array's dtype/shape/offset
+    (padded to `HEADER_BYTES`), then the arrays. Case positions are stored in the narrowest unsigned type.
+    """
+    logger.info(f'Building case index file: {path}')
+    generation = generation or get_data_generation()
+    cases = _fetch_cases()
+    pos_dtype = np.min_scalar_type(max(len(cases) - 1, 0))
+    pair_item, pair_value, pair_start = [], [], []
+    n_entries = 0
+    last = np.full(3, -1, dtype=np.int64)
+    result = db.session.execute(
+        select(models.Variable.item, models.Variable.value, models.Variable.case).where(
+            models.Variable.case.isnot(None), models.Variable.item.isnot(None), models.Variable.value.isnot(None),
+        ).order_by(
+            models.Variable.item, models.Variable.value, models.Variable.case,
+        ).execution_options(yield_per=FETCH_SIZE)
+    )
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.seek(HEADER_BYTES)
+        for partition in result.partitions():
+            entries = np.array(partition, dtype=np.int64).reshape(-1, 3)
+            entries = entries[np.any(entries != _previous_rows(entries, last), axis=1)]  # drop duplicate rows
+            if not len(entries):
+                continue
+            starts = np.flatnonzero(np.any(entries[:, :2] != _previous_rows(entries, last)[:, :2], axis=1))
+            pair_item.append(entries[starts, 0])
+            pair_value.append(entries[starts, 1])
+            pair_start.append(starts + n_entries)
+            fh.write(np.searchsorted(cases, entries[:, 2]).astype(pos_dtype).tobytes())
+            n_entries += len(entries)
+            last = entries[-1]
+        pair_value = np.concatenate(pair_value) if pair_value else np.empty(0, dtype=np.int64)
+        arrays = {
+            'cases': cases,
+            'pair_item': np.concatenate(pair_item) if pair_item else np.empty(0, dtype=np.int64),
+            'pair_value': pair_value,
+            'pair_numeric': _pair_numeric(pair_value),
+            'pair_start': np.append(np.concatenate(pair_start) if pair_start else [], n_entries).astype(np.int64),
+        }
+        specs = {'case_pos': {'dtype': pos_dtype.str, 'shape': (n_entries,), 'offset': 0}}
+        size = _aligned(n_entries * pos_dtype.itemsize)
+        for name, array in arrays.items():
+            specs[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': size}
+            fh.seek(HEADER_BYTES + size)
+            fh.write(np.ascontiguousarray(array).tobytes())
+            size = _aligned(size + array.nbytes)
+        fh.truncate(HEADER_BYTES + size)
+        header = json.dumps({'generation': generation, 'arrays': specs}).encode('utf8')
+        header_length = HEADER_BYTES - len(FILE_MAGIC) - 8
+        if len(header) > header_length:
+            raise ValueError(f'case index header exceeds {header_length} bytes')
+        fh.seek(0)
+        fh.write(FILE_MAGIC + header_length.to_bytes(8, 'little') + header.ljust(header_length))
+    os.replace(tmp_path, path)
+    logger.info(f'Built case index file: {len(cases)} cases, {len(pair_value)} values, {n_entries} entries'
+                f' ({HEADER_BYTES + size} bytes).')
+
+
+def _previous_rows(entries, last):
+    """Row preceding each row of `entries`, the first being preceded by `last` (from the previous batch)"""
+    return np.concatenate([last[np.newaxis], entries[:-1]])
+
+
+def _fetch_cases():
+    """Sorted case ids of `Variable`"""
+    result = db.session.execute(
+        select(models.Variable.case).where(models.Variable.case.isnot(None)).distinct()
+        .execution_options(yield_per=FETCH_SIZE)
+    ).scalars()
+    parts = [np.fromiter(partition, dtype=np.int64, count=len(partition)) for partition in result.partitions()]
+    return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+
+def _pair_numeric(pair_value):
+    """`Value.name_numeric` for each value id (nan if not numeric)"""
+    numeric = {
+        value_id: name_numeric for value_id, name_numeric in
+        db.session.query(models.Value.id, models.Value.name_numeric).filter(models.Value.name_numeric.isnot(None))
+    }
+    return np.array([numeric.get(v, np.nan) for v in pair_value.tolist()], dtype=np.float64)
+
+
+def open_case_index(path):
+    """Memory-map a case index file (read-only)"""
+    with open(path, 'rb') as fh:
+        if fh.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f'not a case index file: {path}')
+        header = json.loads(fh.read(int.from_bytes(fh.read(8), 'little')))
+        data_start = _aligned(fh.tell())
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = []
+    for name in INDEX_ARRAYS:
+        spec = header['arrays'][name]
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        arrays.append(buffer[start:start + dtype.itemsize * int(np.prod(spec['shape']))].view(dtype))
+    return MappedCaseIndex(path, header['generation'], *arrays)
+
+
+def build_case_index(generation=None):
+    """Read all `Variable` rows once (in batches) into integer arrays."""
+    logger.info('Building case index.')
+    parts = []
+    result = db.session.execute(
+        select(
+            models.Variable.case,
+            func.coalesce(models.Variable.item, -1),
+            func.coalesce(models.Variable.value, -1),
+        ).where(models.Variable.case.isnot(None)).execution_options(yield_per=FETCH_SIZE)
+    )
+    for partition in result.partitions():
+        parts.append(np.array(partition, dtype=np.int64).reshape(-1, 3))
+    entries = np.concatenate(parts) if parts else np.empty((0, 3), dtype=np.int64)
+    cases = np.unique(entries[:, 0])
+    entries = entries[(entries[:, 1] >= 0) & (entries[:, 2] >= 0)]  # only these can be matched by a filter
+    order = np.lexsort((entries[:, 0], entries[:, 2], entries[:, 1]))  # item, value, case
+    entries = entries[order]
+    keep = np.ones(len(entries), dtype=bool)
+    keep[1:] = np.any(entries[1:] != entries[:-1], axis=1)  # drop duplicate rows
+    entries = entries[keep]
+
+    new_pair = np.ones(len(entries), dtype=bool)
+    new_pair[1:] = (entries[1:, 1] != entries[:-1, 1]) | (entries[1:, 2] != entries[:-1, 2])
+    pair_start = np.append(np.flatnonzero(new_pair), len(entries)).astype(np.int64)
+    pair_item = entries[pair_start[:-1], 1]
+    pair_value = entries[pair_start[:-1], 2]
+    pair_numeric = _pair_numeric(pair_value)
+    case_pos = np.searchsorted(cases, entries[:, 0]).astype(np.int32)
+    logger.info(f'Built case index: {len(cases)} cases, {len(pair_item)} values, {len(case_pos)} entries.')
+    return CaseIndex(generation or get_data_generation(),
+                     cases, case_pos, pair_item, pair_value, pair_numeric, pair_start)
@@ -0,0 +1,268 @@
+"""
+Resident, read-only catalog of categories, items, and values.
+
+This is built once per data generation (see `load_globals.initialize`) so that the
+category/item/value endpoints can be answered without touching the database.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from loguru import logger
+from sqlalchemy import func, select
+
+from dqt_api import db, models
+from dqt_api.id_sets import execute_with_ids
+
+
+class Record(object):
+    """Immutable record with named slots (subclasses only define `__slots__`)."""
+    __slots__ = ()
+
+    def __init__(self, *args):
+        for name, arg in zip(self.__slots__, args):
+            object.__setattr__(self, name, arg)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(id={getattr(self, "id", None)!r}, name={getattr(self, "name", None)!r})'
+
+
+class CategoryRecord(Record):
+    __slots__ = ('id', 'name', 'description', 'order', 'item_ids')
+
+
+class ItemRecord(Record):
+    """`range` is (start, end, step) as strings for numeric items; `value_ids` are sorted for display."""
+    __slots__ = ('id', 'name', 'varname', 'description', 'category_id', 'is_loaded', 'range', 'value_ids')
+
+
+class ValueRecord(Record):
+    __slots__ = ('id', 'name', 'name_numeric', 'description', 'order')
+
+    @property
+    def display_order(self):
+        return self.order if self.order is not None else 100
+
+
+class Catalog(object):
+    """Categories (in display order), items, and values along with their relationships."""
+    __slots__ = ('generation', 'categories', 'items', 'values', 'item_of_value')
+
+    def __init__(self, generation, categories, items, values, item_of_value):
+        self.generation = generation
+        self.categories = categories  # id -> CategoryRecord, in display order
+        self.items = items  # id -> ItemRecord
+        self.values = values  # id -> ValueRecord
+        self.item_of_value = item_of_value  # value id -> first item id using that value
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, attr in zip(self.__slots__, state):
+            setattr(self, name, attr)
+
+    def value_json(self, value_id):
+        v = self.values[value_id]
+        return {
+            'id': v.id,
+            'name': v.name,
+            'description': v.description,
+            'order': v.display_order,
+        }
+
+    def item_values_json(self, item_id, offset=0, limit=None):
+        value_ids = self.items[item_id].value_ids
+        return [self.value_json(v) for v in value_ids[offset:None if limit is None else offset + limit]]
+
+    def item_json(self, item_id, value_limit=None):
+        """
+        :param value_limit: if specified, only include this many values and add 'valuesTotal'
+            so that the remainder can be requested from `/api/item/<id>/values`
+        """
+        item = self.items[item_id]
+        res = {
+            'name': item.name,
+            'id': item.id,
+            'description': item.description,
+            'values': None if item.range else self.item_values_json(item_id, limit=value_limit),
+            'range': list(item.range) if item.range else None,
+        }
+        if value_limit is not None:
+            res['valuesTotal'] = None if item.range else len(item.value_ids)
+        return res
+
+    def category_json(self, category_id, value_limit=None):
+        """Category payload returned by `/api/category/add/<id>`"""
+        category = self.categories[category_id]
+        return {
+            'items': [self.item_json(item_id, value_limit) for item_id in category.item_ids],
+            'id': category.id,
+            'name': category.name,
+            'description': category.description,
+        }
+
+    def value_owners(self):
+        """Map each non-numeric value label to the values, items and categories using it:
+            label -> [(value_id, value_name, item_id, item_name, category_id), ...]
+        """
+        owners = defaultdict(list)
+        for item in self.items.values():
+            for value_id in item.value_ids:
+                value = self.values[value_id]
+                if value.name_numeric is None:
+                    owners[models.normalize_label(value.name)].append(
+                        (value.id, value.name, item.id, item.name, item.category_id)
+                    )
+        return dict(owners)
+
+
+def get_data_generation():
+    """Fingerprint of the loaded data: changes whenever the loader/manage.py adds or removes rows."""
+    parts = []
+    for column in (models.Category.id, models.Item.id, models.Value.id, models.DataModel.case,
+                   models.DataFile.id, models.DataEntry.id):
+        count, max_id = db.session.query(func.count(column), func.max(column)).one()
+        parts.append(f'{column}:{count}:{max_id}')
+    return hashlib.md5('|'.join(parts).encode('utf8')).hexdigest()[:16]
+
+
+def value_display_key(order, name):
+    """Sort key for an item's values: by order (100 if not set; unordered values first), then name"""
+    return order if order is not None else 100, order is not None, name
+
+
+def load_item_values():
+    """Value ids for each item written by the loader to `ItemValue`, in their stored order
+    (empty if table not present).
+    """
+    item_values = defaultdict(list)
+    if not models.has_table(models.ItemValue):
+        logger.warning('Item values have not been loaded: table not created.')
+        return item_values
+    for item_id, value_id in db.session.query(models.ItemValue.item, models.ItemValue.value).order_by(
+            models.ItemValue.item, models.ItemValue.order, models.ItemValue.id):
+        item_values[item_id].append(value_id)
+    return item_values
+
+
+def _get_item_value_ids(items, values):
+    """Value ids for each item in display order: as stored in `ItemValue` or, for data loaded before it,
+    sorted from the older precalculated `Item.values` or, if not loaded, from `Variable`.
+    """
+    item_values = defaultdict(set)
+    stored_item_values = load_item_values() if items else {}
+    unloaded_items = []
+    for item in items:
+        if item.id in stored_item_values:
+            continue
+        elif item.is_loaded:
+            if item.values:
+                item_values[item.id].update(int(x) for x in item.values.split('||'))
+        else:
+            unloaded_items.append(item.id)
+    for partition in execute_with_ids(
+            select(models.Variable.item, models.Variable.value).distinct(), models.Variable.item, unloaded_items,
+    ):
+        for item_id, value_id in partition:
+            if value_id is not None:
+                item_values[item_id].add(value_id)
+    res = {
+        item_id: tuple(sorted(
+            (v for v in value_ids if v in values), key=lambda v: value_display_key(values[v].order, values[v].name),
+        ))
+        for item_id, value_ids in item_values.items()
+    }
+    res.update({
+        item.id: tuple(v for v in stored_item_values[item.id] if v in values)
+        for item in items if item.id in stored_item_values
+    })
+    return res
+
+
+def load_category_payloads():
+    """Category payloads materialized by the loader: category id -> payload (empty if never materialized)."""
+    if not models.has_table(models.CategoryPayload):
+        logger.warning('Category payloads have not been materialized: table not created.')
+        return {}
+    return {
+        category_id: json.loads(payload) for category_id, payload in
+        db.session.query(models.CategoryPayload.category, models.CategoryPayload.payload)
+    }
+
+
+def save_category_payloads():
+    """Compute each category's payload once (after loading) so that startup needs no per-item queries."""
+    logger.info('Materializing category payloads.')
+    catalog = build_catalog(use_payloads=False)
+    db.session.query(models.CategoryPayload).delete()
+    db.session.bulk_save_objects([
+        models.CategoryPayload(category=category_id, payload=json.dumps(catalog.category_json(category_id)))
+        for category_id in catalog.categories
+    ])
+    db.session.commit()
+    logger.info(f'Saved payloads for {len(catalog.categories)} categories.')
+
+
+def build_catalog(generation=None, use_payloads=True):
+    """Read all categories, items, and values in a few bulk queries.
+
+    :param use_payloads: take items' values/ranges from materialized category payloads (if any)
+        rather than from `Item.values` or scanning `Variable`
+    """
+    values = {
+        row.id: ValueRecord(row.id, row.name, row.name_numeric, row.description, row.order)
+        for row in db.session.query(
+            models.Value.id, models.Value.name, models.Value.name_numeric,
+            models.Value.description, models.Value.order,
+        )
+    }
+    item_rows = db.session.query(
+        models.Item.id, models.Item.name, models.Item.varname, models.Item.description,
+        models.Item.category, models.Item.is_loaded, models.Item.is_float, models.Item.values,
+        models.Item.float_range_start, models.Item.float_range_end, models.Item.float_range_step,
+        models.Item.int_range_start, models.Item.int_range_end, models.Item.int_range_step,
+    ).order_by(models.Item.id).all()
+    payload_items = {
+        item['id']: item
+        for payload in (load_category_payloads() if use_payloads else {}).values()
+        for item in payload['items']
+    }
+    item_values = _get_item_value_ids([row for row in item_rows if row.id not in payload_items], values)
+
+    items = {}
+    items_by_category = defaultdict(list)
+    item_of_value = {}
+    for row in item_rows:
+        item_range = None
+        if row.id in payload_items:  # materialized by loader
+            payload_item = payload_items[row.id]
+            if payload_item['range']:
+                item_range = tuple(payload_item['range'])
+            else:
+                item_values[row.id] = tuple(v['id'] for v in payload_item['values'] or () if v['id'] in values)
+        elif row.is_loaded and not item_values.get(row.id):  # precalculated range
+            if row.is_float:
+                item_range = (str(row.float_range_start), str(row.float_range_end), str(row.float_range_step))
+            else:
+                item_range = (str(row.int_range_start), str(row.int_range_end), str(row.int_range_step))
+        value_ids = item_values.get(row.id, ())
+        items[row.id] = ItemRecord(row.id, row.name, row.varname, row.description, row.category,
+                                   bool(row.is_loaded), item_range, value_ids)
+        items_by_category[row.category].append(row.id)
+        for value_id in value_ids:
+            item_of_value.setdefault(value_id, row.id)
+
+    categories = {
+        row.id: CategoryRecord(row.id, row.name, row.description, row.order, tuple(items_by_category[row.id]))
+        for row in db.session.query(
+            models.Category.id, models.Category.name, models.Category.description, models.Category.order,
+        ).order_by(models.Category.order)
+    }
+    return Catalog(generation or get_data_generation(), categories, items, values, item_of_value)
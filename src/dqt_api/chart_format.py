@@ -0,0 +1,115 @@
+"""
+Compact encodings of `/api/filter/chart` for clients which ask for them (`?format=` or `Accept`).
+
+The default JSON repeats every label (age buckets in each row of the Google charts, headers of
+each table row). Version 2 stores each distinct string once in `strings` and refers to it by
+index, with the counts as parallel integer arrays:
+
+    {
+        "version": 2,
+        "strings": ["total-count", "Total Population", ..., "0-9", ..., "Male", ...],
+        "rows": {"id": [0, ...], "header": [1, ...], "value": [3000, ...]},
+        "age_bl": {"labels": [8, ...], "series": [12, ...], "data": [[count for each label], ...]},
+        "age_fu": {...}
+    }
+
+The same structure can be sent as MessagePack if the `msgpack` package is installed.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for `application/msgpack`
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+CHART_V2_MIMETYPE = 'application/vnd.dqt.chart.v2+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+CHART_FORMATS = {
+    'json': JSON_MIMETYPE,
+    'v2': CHART_V2_MIMETYPE,
+    'msgpack': MSGPACK_MIMETYPE,
+}
+
+
+def available_mimetypes():
+    """Mimetypes which can be produced, in order of preference for an `Accept: */*`"""
+    mimetypes = [JSON_MIMETYPE, CHART_V2_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    return mimetypes
+
+
+class StringTable(object):
+    """Assign each distinct string an index in order of first use"""
+    __slots__ = ('strings', 'index')
+
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def __call__(self, value):
+        try:
+            return self.index[value]
+        except KeyError:
+            self.index[value] = len(self.strings)
+            self.strings.append(value)
+            return self.index[value]
+
+
+def legacy_chart(chart):
+    """Default JSON structures from `ChartData`: table rows, age/sex charts (as for Chart.js),
+    and the same charts as Google chart tables
+
+    :return: subject_counts, sex_data_bl, sex_data_fu, sex_data_bl_g, sex_data_fu_g
+    """
+    subject_counts = [
+        {'id': row_id, 'header': header, 'value': value}
+        for row_id, header, value in zip(chart.row_ids, chart.row_headers, chart.row_values)
+    ]
+    sex_data = [
+        {
+            'labels': list(chart.age_labels),
+            'datasets': [{'label': label, 'data': data} for label, data in zip(labels, counts.tolist())],
+        }
+        for labels, counts in chart.series
+    ]
+    google = [_google_chart(chart.age_labels, labels, counts) for labels, counts in chart.series]
+    return subject_counts, sex_data[0], sex_data[1], google[0], google[1]
+
+
+def _google_chart(age_labels, labels, counts):
+    """Header row ('Age', sex labels...), then each age label with its counts"""
+    return [['Age'] + list(labels)] + [[age_label] + data for age_label, data in zip(age_labels, counts.T.tolist())]
+
+
+def compact_chart(chart):
+    """Version 2 of the chart data from `ChartData`"""
+    ref = StringTable()
+    rows = {
+        'id': [ref(row_id) for row_id in chart.row_ids],
+        'header': [ref(header) for header in chart.row_headers],
+        'value': list(chart.row_values),
+    }
+    age_bl, age_fu = (
+        {
+            'labels': [ref(label) for label in chart.age_labels],
+            'series': [ref(label) for label in labels],
+            'data': counts.tolist(),
+        }
+        for labels, counts in chart.series
+    )
+    return {
+        'version': 2,
+        'rows': rows,
+        'age_bl': age_bl,
+        'age_fu': age_fu,
+        'strings': ref.strings,
+    }
+
+
+def encode_chart(data, mimetype):
+    """Serialize compact chart data as `mimetype` (either version 2 JSON or MessagePack)"""
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, separators=(',', ':')).encode('utf8') + b'\n'
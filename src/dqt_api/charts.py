@@ -0,0 +1,199 @@
+"""
+Cohort charts from additive aggregates over the dimension frame.
+
+For each age variable (age_bl, age_fu), the selected rows are counted by sex x age bin x enrollment,
+with an extra age slot for rows without a binned age (missing/below `AGE_MIN`) and an extra enrollment
+slot for missing enrollment, along with the sum and number of follow-up years. These aggregates add
+across disjoint selections. `render_chart` reproduces the charts of `views.get_chart_data`
+from them, including masking small cells and excluding their cases from enrollment and follow-up.
+"""
+import numpy as np
+
+from dqt_api.dimensions import bin_codes
+
+AGE_VARS = ('age_bl', 'age_fu')
+COUNT, FOLLOWUP_SUM, FOLLOWUP_COUNT = range(3)  # statistics in aggregates
+
+
+class ChartCells(object):
+    """Aggregate cell of each frame row for each age variable (-1 if sex is missing).
+
+    Aggregates are arrays of shape (len(AGE_VARS), 3, sexes, age bins + 1, enrollments + 1)
+    indexed by [age var, statistic, sex, age bin, enrollment].
+    """
+    __slots__ = ('sex_labels', 'enrollment_labels', 'age_buckets', 'shape', 'codes', 'followup',
+                 'index_positions')
+
+    def __init__(self, frame, case_index, age_bins):
+        self.sex_labels = frame.labels['sex']
+        self.enrollment_labels = frame.labels['enrollment']
+        sex = frame.columns['sex']
+        enrollment = np.where(frame.columns['enrollment'] < 0, len(self.enrollment_labels),
+                              frame.columns['enrollment'])
+        self.codes = []
+        for age_var in AGE_VARS:
+            age_codes, self.age_buckets = bin_codes(frame.columns[age_var], *age_bins)
+            age_codes = np.where(age_codes < 0, len(self.age_buckets), age_codes)
+            codes = (sex * (len(self.age_buckets) + 1) + age_codes) * (len(self.enrollment_labels) + 1)
+            self.codes.append(np.where(sex < 0, -1, codes + enrollment))
+        self.shape = (len(self.sex_labels), len(self.age_buckets) + 1, len(self.enrollment_labels) + 1)
+        self.followup = frame.columns['followup_years']
+        # position of each frame row's case in the case index (-1 if not there)
+        positions = np.searchsorted(case_index.cases, frame.cases)
+        found = positions < len(case_index.cases)
+        found[found] = case_index.cases[positions[found]] == frame.cases[found]
+        self.index_positions = np.where(found, positions, -1)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def rows_for(self, case_mask):
+        """Frame rows selected by a boolean mask over the case index's cases"""
+        rows = np.zeros(len(self.index_positions), dtype=bool)
+        found = self.index_positions >= 0
+        rows[found] = case_mask[self.index_positions[found]]
+        return rows
+
+    def aggregate(self, rows):
+        return self.aggregate_many([rows])[0]
+
+    def aggregate_many(self, rows_list):
+        """Aggregates for several selections of rows, one `bincount` per statistic and age variable
+
+        :param rows_list: boolean masks over frame rows
+        """
+        res = np.zeros((len(rows_list), len(AGE_VARS), 3) + self.shape, dtype=np.float64)
+        if not rows_list:
+            return res
+        has_followup = ~np.isnan(self.followup)
+        followup = np.where(has_followup, self.followup, 0)
+        n = len(rows_list) * self.size
+        shape = (len(rows_list),) + self.shape
+        for a, codes in enumerate(self.codes):
+            selected = [np.flatnonzero(rows & (codes >= 0)) for rows in rows_list]
+            flat = np.concatenate([codes[x] + i * self.size for i, x in enumerate(selected)])
+            rows = np.concatenate(selected)
+            res[:, a, COUNT] = np.bincount(flat, minlength=n).reshape(shape)
+            res[:, a, FOLLOWUP_SUM] = np.bincount(flat, weights=followup[rows], minlength=n).reshape(shape)
+            res[:, a, FOLLOWUP_COUNT] = np.bincount(flat, weights=has_followup[rows], minlength=n).reshape(shape)
+        return res
+
+    def aggregate_pairs(self, case_index, lo=0, hi=None):
+        """Aggregates for the cases having each (item, value) pair of the case index (only pairs `lo:hi`,
+        if specified), in one pass over its entries
+
+        :return: array of shape (pairs,) + aggregate shape
+        """
+        hi = len(case_index.pair_item) if hi is None else hi
+        n_pairs = hi - lo
+        starts = case_index.pair_start[lo:hi + 1]
+        found = np.flatnonzero(self.index_positions >= 0)
+        frame_rows = np.full(case_index.size, -1, dtype=np.int64)
+        frame_rows[self.index_positions[found]] = found
+        rows = frame_rows[case_index.case_pos[starts[0]:starts[-1]]]
+        pairs = np.repeat(np.arange(n_pairs, dtype=np.int64), np.diff(starts))
+        keep = rows >= 0
+        return self._aggregate_entries(rows[keep], pairs[keep], n_pairs)
+
+    def aggregate_groups(self, case_groups, n_groups):
+        """Aggregates for disjoint groups of cases
+
+        :param case_groups: group (0 to n_groups - 1, or -1 for none) of each case of the case index
+        :return: array of shape (n_groups,) + aggregate shape
+        """
+        rows = np.flatnonzero(self.index_positions >= 0)
+        groups = case_groups[self.index_positions[rows]]
+        keep = groups >= 0
+        return self._aggregate_entries(rows[keep], groups[keep].astype(np.int64), n_groups)
+
+    def _aggregate_entries(self, rows, groups, n_groups):
+        """Aggregate frame rows into groups: each (row, group) entry contributes to its group"""
+        res = np.zeros((n_groups, len(AGE_VARS), 3) + self.shape, dtype=np.float64)
+        has_followup = ~np.isnan(self.followup)
+        followup = np.where(has_followup, self.followup, 0)
+        n = n_groups * self.size
+        shape = (n_groups,) + self.shape
+        for a, codes in enumerate(self.codes):
+            entry_codes = codes[rows]
+            selected = entry_codes >= 0
+            flat = groups[selected] * self.size + entry_codes[selected]
+            selected_rows = rows[selected]
+            res[:, a, COUNT] = np.bincount(flat, minlength=n).reshape(shape)
+            res[:, a, FOLLOWUP_SUM] = np.bincount(flat, weights=followup[selected_rows], minlength=n).reshape(shape)
+            res[:, a, FOLLOWUP_COUNT] = np.bincount(
+                flat, weights=has_followup[selected_rows], minlength=n).reshape(shape)
+        return res
+
+
+class ChartData(object):
+    """Chart for a selection as arrays, from which each response format is produced (see `chart_format`)
+
+    row_ids, row_headers, row_values: 'cohort subjects' table rows
+    age_labels: labels of the age bins
+    series: for each age variable, (sex labels, subjects by sex x age bin as an integer array)
+    """
+    __slots__ = ('row_ids', 'row_headers', 'row_values', 'age_labels', 'series')
+
+    def __init__(self, row_ids, row_headers, row_values, age_labels, series):
+        self.row_ids = row_ids
+        self.row_headers = row_headers
+        self.row_values = row_values
+        self.age_labels = age_labels
+        self.series = series
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, attr in zip(self.__slots__, state):
+            setattr(self, name, attr)
+
+    def row_value(self, row_id):
+        return self.row_values[self.row_ids.index(row_id)]
+
+    def zeroed(self):
+        """Same rows and series with every value set to 0 (e.g., for a selection without results)"""
+        return ChartData(self.row_ids, self.row_headers, [0] * len(self.row_values), self.age_labels,
+                         tuple((labels, np.zeros_like(counts)) for labels, counts in self.series))
+
+
+def render_chart(cells, aggregates, jitter_function, mask_value):
+    """Charts from aggregates as computed by `views.get_chart_data` (see `views.format_chart`)
+
+    :return: age labels, (sex labels, jittered and masked counts) for each age variable,
+        [(sex label, subjects), ...], enrollment counts [(label, count), ...],
+        selected subjects, and mean follow-up years (None if no follow-up)
+    """
+    n_bins = len(cells.age_buckets)
+    results = []
+    for a in range(len(AGE_VARS)):
+        counts = aggregates[a, COUNT].sum(axis=2).astype(np.int64)  # sex x age slot
+        sexes = np.flatnonzero(counts.sum(axis=1) > 0)
+        labels = [str(cells.sex_labels[s]).capitalize() for s in sexes]
+        masked = np.zeros((len(sexes), n_bins), dtype=np.int64)
+        for i, (s, label) in enumerate(zip(sexes, labels)):
+            masked[i] = [jitter_function(v, mask=mask_value, label=f'{label}{b}')
+                         for b, v in enumerate(counts[s, :n_bins].tolist())]
+        excluded = np.zeros(counts.shape, dtype=bool)
+        excluded[sexes, :n_bins] = (counts[sexes, :n_bins] > 0) & (masked == 0)
+        results.append(((labels, masked), excluded))
+
+    (series_bl, excluded_bl), (series_fu, excluded_fu) = results
+    selected_bl, selected_fu = int(series_bl[1].sum()), int(series_fu[1].sum())
+    # censor same cases for enrollment based on whichever age has fewer excluded cases
+    if selected_bl > selected_fu:
+        a, excluded, selected_subjects, (labels, masked) = 0, excluded_bl, selected_bl, series_bl
+    else:
+        a, excluded, selected_subjects, (labels, masked) = 1, excluded_fu, selected_fu, series_fu
+    sex_totals = list(zip(labels, masked.sum(axis=1).tolist()))
+    remaining = np.where(excluded[np.newaxis, :, :, np.newaxis], 0, aggregates[a])
+    enrollment_present = remaining[COUNT].sum(axis=(0, 1)) > 0
+    enroll_counts = [
+        (str(cells.enrollment_labels[e]).capitalize(), int(remaining[COUNT, :, :n_bins, e].sum()))
+        for e in np.flatnonzero(enrollment_present[:len(cells.enrollment_labels)])
+    ]
+    followup_count = remaining[FOLLOWUP_COUNT].sum()
+    followup_mean = remaining[FOLLOWUP_SUM].sum() / followup_count if followup_count else None
+    return (list(cells.age_buckets), series_bl, series_fu, sex_totals, enroll_counts, selected_subjects,
+            followup_mean)
@@ -0,0 +1,79 @@
+"""
+Codebook: every item and value with the number of subjects (for the population and, optionally,
+for a selection), written as csv or xlsx one row at a time.
+"""
+import csv
+import io
+import tempfile
+
+import numpy as np
+from openpyxl import Workbook
+
+CSV_CHUNK_ROWS = 1000
+
+
+def iter_codebook_rows(catalog, case_index, count_function, mask=None):
+    """Rows of the codebook (header first)
+
+    All counts come from one pass over the case index for the population and one for the selection.
+
+    :param count_function: function(count, item_id, value_id) -> masked/jittered count
+    :param mask: selected cases (adds a 'selected' column)
+    """
+    header = ['category', 'item', 'variable', 'value_id', 'value', 'description', 'subjects']
+    if mask is not None:
+        header.append('selected')
+    yield header
+    population = case_index.pair_counts()
+    selected = None if mask is None else case_index.pair_counts(mask)
+    for category in catalog.categories.values():
+        for item_id in category.item_ids:
+            item = catalog.items[item_id]
+            lo, hi = case_index.item_pairs(item_id)
+            pairs = dict(zip(case_index.pair_value[lo:hi].tolist(), range(lo, hi)))
+            if item.value_ids:
+                value_ids = item.value_ids
+            else:  # numeric: in order of value
+                order = np.argsort(case_index.pair_numeric[lo:hi], kind='stable')
+                value_ids = case_index.pair_value[lo:hi][order].tolist()
+            for value_id in value_ids:
+                value = catalog.values.get(value_id, None)
+                pair = pairs.get(value_id, None)
+                row = [
+                    category.name, item.name, item.varname, value_id,
+                    None if value is None else value.name,
+                    None if value is None else value.description,
+                    0 if pair is None else count_function(int(population[pair]), item_id, value_id),
+                ]
+                if selected is not None:
+                    row.append(0 if pair is None else count_function(int(selected[pair]), item_id, value_id))
+                yield row
+
+
+def iter_csv(rows, chunk_rows=CSV_CHUNK_ROWS):
+    """Encode rows as csv, yielding a chunk of bytes every `chunk_rows` rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % chunk_rows == 0:
+            yield buffer.getvalue().encode('utf8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf8')
+
+
+def write_xlsx(rows):
+    """Write rows to a temporary xlsx file (openpyxl's write-only mode does not keep rows in memory)
+
+    :return: file object positioned at start
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('codebook')
+    for row in rows:
+        worksheet.append(row)
+    fh = tempfile.TemporaryFile()
+    workbook.save(fh)
+    fh.seek(0)
+    return fh
@@ -0,0 +1,101 @@
+"""
+Unjittered chart aggregates (see `charts.ChartCells`) for every combination of values of a few
+frequently-filtered items (`CUBE_ITEMS`), built after a data load.
+
+Each cube item is an axis with one slot per value (in case index pair order) and a final slot for
+cases without a value. A filter selects slots along its item's axis, and any set of filters on cube
+items is answered by summing the selected cells. Only items for which no case has more than one
+value can be used, and items are skipped (in the configured order) once the cube would exceed
+`CUBE_MAX_BYTES`.
+"""
+import math
+
+import numpy as np
+from loguru import logger
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class AggregateCube(object):
+    """
+    requested_items: `CUBE_ITEMS` when built (to detect configuration changes)
+    items: item id of each axis
+    aggregates: array of shape (slots of each axis) + aggregate shape
+    cases: number of cases in each cell, array of shape (slots of each axis)
+    """
+    __slots__ = ('generation', 'age_bins', 'requested_items', 'items', 'aggregates', 'cases')
+
+    def __init__(self, generation, age_bins, requested_items, items, aggregates, cases):
+        self.generation = generation
+        self.age_bins = age_bins
+        self.requested_items = requested_items
+        self.items = items
+        self.aggregates = aggregates
+        self.cases = cases
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, attr in zip(self.__slots__, state):
+            setattr(self, name, attr)
+
+    def lookup(self, case_index, arg_list):
+        """Number of selected cases and aggregates for the filters
+
+        :return: (selected, aggregates), or None if a filter is not on a cube item
+        :raises ValueError: if a filter cannot be parsed
+        """
+        selections = {}
+        for key, val in arg_list:
+            item_id = int(key)
+            if item_id not in self.items:
+                return None
+            axis = self.items.index(item_id)
+            _, _, selected = case_index.select_pairs(item_id, val)
+            selected = np.append(selected, False)  # cases without a value never match
+            selections[axis] = selections[axis] & selected if axis in selections else selected
+        aggregates, cases = self.aggregates, self.cases
+        for axis, selected in selections.items():
+            aggregates = aggregates.compress(selected, axis=axis)
+            cases = cases.compress(selected, axis=axis)
+        axes = tuple(range(len(self.items)))
+        return int(cases.sum()), aggregates.sum(axis=axes)
+
+
+def build_cube(case_index, cells, age_bins, item_ids, max_bytes=DEFAULT_MAX_BYTES):
+    """Aggregates for every combination of values of `item_ids` (those which can be included, in order)
+
+    :return: `AggregateCube` (without any items if none could be included)
+    """
+    logger.info(f'Building aggregate cube for items: {item_ids}.')
+    cell_bytes = (len(cells.codes) * 3 * cells.size + 1) * np.dtype(np.float64).itemsize
+    items, dims, item_codes = [], [], []
+    for item_id in item_ids:
+        lo, hi = case_index.item_pairs(item_id)
+        starts = case_index.pair_start[lo:hi + 1]
+        positions = case_index.case_pos[starts[0]:starts[-1]]
+        if hi == lo:
+            logger.warning(f'Skipping cube item {item_id}: no values.')
+            continue
+        if len(np.unique(positions)) != len(positions):
+            logger.warning(f'Skipping cube item {item_id}: some cases have more than one value.')
+            continue
+        if math.prod(dims + [hi - lo + 1]) * cell_bytes > max_bytes:
+            logger.warning(f'Skipping cube item {item_id}: cube would exceed {max_bytes} bytes.')
+            continue
+        codes = np.full(case_index.size, hi - lo, dtype=np.int64)  # last slot: no value
+        codes[positions] = np.repeat(np.arange(hi - lo, dtype=np.int64), np.diff(starts))
+        items.append(item_id)
+        dims.append(hi - lo + 1)
+        item_codes.append(codes)
+    if not items:
+        logger.warning('No items for aggregate cube.')
+        return AggregateCube(case_index.generation, age_bins, tuple(item_ids), (), None, None)
+    n_cells = math.prod(dims)
+    case_cells = np.ravel_multi_index(item_codes, dims)
+    aggregates = cells.aggregate_groups(case_cells, n_cells)
+    aggregates = aggregates.reshape(tuple(dims) + aggregates.shape[1:])
+    cases = np.bincount(case_cells, minlength=n_cells).reshape(dims)
+    logger.info(f'Built aggregate cube: items {items}, {n_cells} cells, {aggregates.nbytes + cases.nbytes} bytes.')
+    return AggregateCube(case_index.generation, age_bins, tuple(item_ids), tuple(items), aggregates, cases)
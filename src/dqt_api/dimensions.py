@@ -0,0 +1,159 @@
+"""
+Resident, integer-coded copy of `DataModel` for aggregating the current selection.
+
+Categorical columns (e.g., sex, enrollment) are stored as codes into a list of labels
+(-1 when missing) and numeric columns (e.g., ages) as floats (nan when missing). Any
+two- or three-way table is then one `bincount` over the combined codes of the selected rows.
+
+Additional dimensions (`DATA_MODEL_DIMENSIONS`) are already dictionary-encoded by the loader
+(`DimensionLabel`/`CaseDimension`) and are included automatically.
+"""
+import math
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import select
+
+from dqt_api import db, models
+from dqt_api.catalog import get_data_generation
+
+FETCH_SIZE = 100_000
+CATEGORICAL_COLUMNS = ('sex', 'enrollment')
+NUMERIC_COLUMNS = ('age_bl', 'age_fu', 'followup_years')
+AGE_COLUMNS = ('age_bl', 'age_fu')  # binned by the configured age step
+
+
+class DimensionFrame(object):
+    """
+    cases: sorted case ids
+    columns: name -> codes (int32, -1 if missing) for categorical columns, or values (float64) for numeric
+    labels: name -> labels for categorical column codes
+    """
+    __slots__ = ('generation', 'cases', 'columns', 'labels')
+
+    def __init__(self, generation, cases, columns, labels):
+        self.generation = generation
+        self.cases = cases
+        self.columns = columns
+        self.labels = labels
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, attr in zip(self.__slots__, state):
+            setattr(self, name, attr)
+
+    @property
+    def size(self):
+        return len(self.cases)
+
+    @property
+    def dimensions(self):
+        return tuple(self.labels) + AGE_COLUMNS
+
+    def rows_for(self, case_ids):
+        """Boolean mask over rows for the (sorted, unique) case ids"""
+        return np.isin(self.cases, case_ids, assume_unique=True)
+
+    def codes(self, name, age_bins=None):
+        """Codes and labels for a dimension; numeric columns are binned
+
+        :param age_bins: (age_min, age_max, age_step) for age columns
+        """
+        if name in self.labels:
+            return self.columns[name], self.labels[name]
+        if name in AGE_COLUMNS and age_bins:
+            return bin_codes(self.columns[name], *age_bins)
+        raise KeyError(name)
+
+    def crosstab(self, dimensions, rows=None, age_bins=None):
+        """Number of rows for each combination of the dimensions' labels
+
+        :param rows: boolean mask of selected rows (all if None)
+        :return: counts (array with one axis per dimension), labels for each dimension
+        """
+        codes, labels = zip(*(self.codes(name, age_bins) for name in dimensions))
+        shape = tuple(len(x) for x in labels)
+        keep = np.ones(self.size, dtype=bool) if rows is None else rows.copy()
+        for code in codes:
+            keep &= code >= 0
+        flat = np.ravel_multi_index(tuple(code[keep] for code in codes), shape)
+        counts = np.bincount(flat, minlength=math.prod(shape)).reshape(shape)
+        return counts, labels
+
+
+def bin_codes(values, age_min, age_max, age_step):
+    """Bin numeric values as the charts do: values >= (age_max - age_step) share the top bin;
+    missing values or those below `age_min` get -1.
+    """
+    labels = [f'{age}-{age + age_step - 1}' for age in range(age_min, age_max - age_step, age_step)]
+    labels.append(f'{age_max - age_step}+')
+    with np.errstate(invalid='ignore'):
+        codes = np.floor((values - age_min) / age_step)
+        codes = np.where(values >= age_max, len(labels) - 1, codes)
+        codes = np.where(np.isnan(values) | (values < age_min), -1, np.minimum(codes, len(labels) - 1))
+    return codes.astype(np.int32), labels
+
+
+def build_dimension_frame(generation=None):
+    """Read `DataModel` once (in batches) into coded columns."""
+    logger.info('Building dimension frame.')
+    names = ('case',) + CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+    rows = []
+    result = db.session.execute(
+        select(*(getattr(models.DataModel, name) for name in names)).execution_options(yield_per=FETCH_SIZE)
+    )
+    for partition in result.partitions():
+        rows.extend(partition)
+    raw = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+    cases = np.array(raw['case'], dtype=np.int64)
+    order = np.argsort(cases, kind='stable')
+    columns = {}
+    labels = {}
+    for name in CATEGORICAL_COLUMNS:
+        labels[name] = sorted({x for x in raw[name] if x is not None})
+        lookup = {label: i for i, label in enumerate(labels[name])}
+        columns[name] = np.array([lookup.get(x, -1) for x in raw[name]], dtype=np.int32)[order]
+    for name in NUMERIC_COLUMNS:
+        columns[name] = np.array([np.nan if x is None else x for x in raw[name]], dtype=np.float64)[order]
+    cases = cases[order]
+    for name, (dimension_labels, dimension_codes) in load_dimensions(cases).items():
+        if name in columns:
+            logger.warning(f'Skipping dimension which duplicates a DataModel column: {name}')
+            continue
+        labels[name] = dimension_labels
+        columns[name] = dimension_codes
+    logger.info(f'Built dimension frame: {len(cases)} cases, dimensions: {", ".join(labels)}.')
+    return DimensionFrame(generation or get_data_generation(), cases, columns, labels)
+
+
+def load_dimensions(cases):
+    """Additional dimensions written by the loader: name -> (labels, codes aligned to `cases`)
+    (empty if the tables are not present)
+    """
+    dimensions = {}
+    if not (models.has_table(models.DimensionLabel) and models.has_table(models.CaseDimension)):
+        logger.warning('No data model dimensions: tables not created.')
+        return dimensions
+    for name, code, label in db.session.query(
+            models.DimensionLabel.dimension, models.DimensionLabel.code, models.DimensionLabel.label,
+    ).order_by(models.DimensionLabel.dimension, models.DimensionLabel.code):
+        labels = dimensions.setdefault(name, ([], np.full(len(cases), -1, dtype=np.int32)))[0]
+        if code != len(labels):
+            raise ValueError(f'dimension {name} has non-consecutive codes')
+        labels.append(label)
+    for name, (labels, codes) in dimensions.items():
+        result = db.session.execute(
+            select(models.CaseDimension.case, models.CaseDimension.code).where(
+                models.CaseDimension.dimension == name,
+                models.CaseDimension.case.isnot(None),
+                models.CaseDimension.code.isnot(None),
+            ).execution_options(yield_per=FETCH_SIZE)
+        )
+        for partition in result.partitions():
+            case_codes = np.array(partition, dtype=np.int64).reshape(-1, 2)
+            positions = np.minimum(np.searchsorted(cases, case_codes[:, 0]), max(len(cases) - 1, 0))
+            found = cases[positions] == case_codes[:, 0] if len(cases) else np.zeros(len(case_codes), bool)
+            codes[positions[found]] = case_codes[found, 1]
+    return dimensions
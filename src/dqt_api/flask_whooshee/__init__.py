@@ -2,7 +2,10 @@ import abc
 import errno
 import os
 import re
+import threading
+import time
 import warnings
+from contextlib import contextmanager
 from inspect import isclass
 import sqlalchemy
 
@@ -153,7 +156,7 @@ class AbstractWhoosheer(object):
         """
         index = Whooshee.get_or_create_index(_get_app(cls), cls)
         prepped_string = cls.prep_search_string(search_string, match_substrings)
-        with index.searcher() as searcher:
+        with Whooshee.get_or_create_searcher_pool(_get_app(cls), cls).searcher() as searcher:
             parser = whoosh.qparser.MultifieldParser(cls.schema.names(), index.schema, group=group)
             query = parser.parse(prepped_string)
             results = searcher.search(query, limit=limit)
@@ -184,6 +187,100 @@ class AbstractWhoosheer(object):
 AbstractWhoosheerMeta = abc.ABCMeta('AbstractWhoosheer', (AbstractWhoosheer,), {})
 
 
+class SearcherPool(object):
+    """Holds a single long-lived searcher for a whoosheer's index.
+
+    Opening a searcher reopens every segment reader and re-reads the term
+    dictionary, so the searcher is kept between queries and only refreshed
+    when the index generation changes (e.g., after a commit or reindex).
+    The lock only guards checking and replacing the searcher: searches run
+    concurrently, and each searcher counts its users so that one replaced
+    while in use is closed by its last user rather than under it.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.lock = threading.RLock()
+        self._searcher = None
+        self._users = {}  # id of searcher -> (searcher, number of users)
+        self.opens = 0
+        self.reuses = 0
+        self.refreshes = 0
+        self.refresh_seconds = 0.0
+        self.last_refresh_seconds = 0.0
+
+    @contextmanager
+    def searcher(self):
+        """Yield the shared searcher, refreshing it first if the index has changed."""
+        searcher = self._acquire()
+        try:
+            yield searcher
+        finally:
+            self._release(searcher)
+
+    def _acquire(self):
+        with self.lock:
+            if self._searcher is None:
+                start = time.perf_counter()
+                self._searcher = self.index.searcher()
+                self._record_refresh(time.perf_counter() - start)
+                self.opens += 1
+            elif not self._searcher.up_to_date():
+                start = time.perf_counter()
+                if self._users_of(self._searcher):
+                    # `refresh` closes readers that the current users may still need
+                    self._searcher = self.index.searcher()
+                else:
+                    old = self._searcher
+                    self._searcher = old.refresh()
+                    self._users.pop(id(old), None)
+                self._record_refresh(time.perf_counter() - start)
+                self.refreshes += 1
+            else:
+                self.reuses += 1
+            self._users[id(self._searcher)] = (self._searcher, self._users_of(self._searcher) + 1)
+            return self._searcher
+
+    def _release(self, searcher):
+        with self.lock:
+            users = self._users_of(searcher) - 1
+            if users or searcher is self._searcher:
+                self._users[id(searcher)] = (searcher, users)
+            else:  # replaced while in use
+                del self._users[id(searcher)]
+                searcher.close()
+
+    def _users_of(self, searcher):
+        return self._users.get(id(searcher), (None, 0))[1]
+
+    def _record_refresh(self, elapsed):
+        self.last_refresh_seconds = elapsed
+        self.refresh_seconds += elapsed
+
+    def close(self):
+        """Close the searcher (once no longer in use)."""
+        with self.lock:
+            if self._searcher is not None:
+                searcher, self._searcher = self._searcher, None
+                if not self._users_of(searcher):
+                    self._users.pop(id(searcher), None)
+                    searcher.close()
+
+    def metrics(self):
+        """Counters for searcher reuse and refresh latency."""
+        with self.lock:
+            loads = self.opens + self.refreshes
+            return {
+                'opens': self.opens,
+                'refreshes': self.refreshes,
+                'reuses': self.reuses,
+                'reuse_ratio': self.reuses / (self.reuses + loads) if self.reuses + loads else 0.0,
+                'refresh_seconds_total': self.refresh_seconds,
+                'refresh_seconds_mean': self.refresh_seconds / loads if loads else 0.0,
+                'refresh_seconds_last': self.last_refresh_seconds,
+            }
+
+
 class Whooshee(object):
     """A top level class that allows to register whoosheers and adds an
     on_commit hook to SQLAlchemy.
@@ -241,6 +338,8 @@ class Whooshee(object):
         config = app.extensions.setdefault('whooshee', {})
         # mapping that caches whoosheers to their indexes; used by `get_or_create_index`
         config['whoosheers_indexes'] = {}
+        # mapping of whoosheers to their long-lived searchers; used by `get_or_create_searcher_pool`
+        config['whoosheers_searchers'] = {}
         # store a reference to self whoosheers; this way, even whoosheers created after init_app
         # was called will be found
         config['whoosheers'] = self.whoosheers
@@ -416,6 +515,27 @@ class Whooshee(object):
         app.extensions['whooshee']['whoosheers_indexes'][wh] = index
         return index
 
+    @classmethod
+    def get_or_create_searcher_pool(cls, app, wh):
+        """Gets the shared :class:`SearcherPool` for the given app and
+        whoosheer, creating it (and the index) if necessary.
+
+        :param app: The application instance.
+        :param wh: The whoosheer instance for which the searcher should be
+                   retrieved or created.
+        """
+        pools = app.extensions['whooshee']['whoosheers_searchers']
+        if wh not in pools:
+            pools.setdefault(wh, SearcherPool(cls.get_or_create_index(app, wh)))
+        return pools[wh]
+
+    def searcher_metrics(self):
+        """Reuse and refresh-latency counters for each whoosheer's searcher."""
+        return {
+            getattr(wh, 'index_subdir', type(self).camel_to_snake(wh.__name__)): pool.metrics()
+            for wh, pool in _get_config(self)['whoosheers_searchers'].items()
+        }
+
     def after_insert(self, mapper, connection, target):
         self.on_commit([[target, INSERT_KWD]])
 
@@ -452,11 +572,14 @@ class Whooshee(object):
 
         This method retrieves all the data from the registered models and
         calls the ``update_<model>()`` function for every instance of such
-        model.
+        model, unless the whoosheer defines ``reindex_all(writer)``.
         """
         for wh in self.whoosheers:
             index = type(self).get_or_create_index(_get_app(self), wh)
             with index.writer(timeout=_get_config(self)['writer_timeout']) as writer:
+                if hasattr(wh, 'reindex_all'):  # whoosheer builds its own documents (e.g., deduplicated)
+                    wh.reindex_all(writer)
+                    continue
                 for model in wh.models:
                     method_name = "{0}_{1}".format(UPDATE_KWD, model.__name__.lower())
                     for item in model.query.all():
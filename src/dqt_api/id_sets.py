@@ -0,0 +1,83 @@
+"""
+Restricting a query to a (possibly large) set of ids in a single statement.
+
+SQL Server limits the number of parameters, so `IN` lists have been sent in chunks of 2000,
+with a round trip (and plan) per chunk. Instead, the ids are sent once and joined:
+    - 'openjson': as one JSON parameter expanded by `OPENJSON` (SQL Server 2016+; default for mssql)
+    - 'temp_table': bulk-inserted into a session temporary table (default otherwise, e.g., SQLite;
+      `#dqt_id_set` on SQL Server)
+    - 'in': the previous chunks of `IN` parameters
+`ID_SET_TRANSPORT` in config overrides the default.
+"""
+import json
+from contextlib import contextmanager
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import BigInteger, Column, Integer, MetaData, Table
+
+from dqt_api import app, db
+
+IN_CHUNK_SIZE = 2000  # sql server max 2100 parameters
+INSERT_CHUNK_SIZE = 10_000
+FETCH_SIZE = 10_000
+TRANSPORTS = ('openjson', 'temp_table', 'in')
+
+ID_SET = Table('dqt_id_set', MetaData(), Column('id', Integer, primary_key=True))
+MSSQL_ID_SET = Table('#dqt_id_set', MetaData(), Column('id', BigInteger, primary_key=True))  # session temp table
+
+
+def get_transport():
+    transport = app.config.get('ID_SET_TRANSPORT', None)
+    if transport is None:
+        return 'openjson' if db.session.get_bind().dialect.name == 'mssql' else 'temp_table'
+    if transport not in TRANSPORTS:
+        raise ValueError(f'ID_SET_TRANSPORT must be one of: {", ".join(TRANSPORTS)}')
+    return transport
+
+
+def execute_with_ids(statement, column, ids):
+    """Execute `statement` restricted to rows with `column` in `ids`, yielding partitions of result rows
+
+    :param ids: unique ids (numpy array)
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return
+    transport = get_transport()
+    if transport == 'in':
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            yield from db.session.execute(
+                statement.where(column.in_(ids[start:start + IN_CHUNK_SIZE].tolist()))
+                .execution_options(yield_per=FETCH_SIZE)
+            ).partitions()
+        return
+    with id_set(ids, transport) as id_table:
+        yield from db.session.execute(
+            statement.join(id_table, id_table.c.id == column).execution_options(yield_per=FETCH_SIZE)
+        ).partitions()
+
+
+@contextmanager
+def id_set(ids, transport):
+    """Selectable with a single column `id` holding `ids`"""
+    if transport == 'openjson':
+        yield sqlalchemy.text(
+            'SELECT CAST([value] AS BIGINT) AS id FROM OPENJSON(:ids)'
+        ).bindparams(ids=json.dumps(ids.tolist())).columns(id=BigInteger).subquery('id_set')
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'mssql':
+        table = MSSQL_ID_SET
+        connection.exec_driver_sql(f"IF OBJECT_ID('tempdb..{table.name}') IS NULL"
+                                   f' CREATE TABLE {table.name} (id BIGINT PRIMARY KEY)')
+    else:
+        table = ID_SET
+        connection.exec_driver_sql(f'CREATE TEMPORARY TABLE IF NOT EXISTS {table.name} (id INTEGER PRIMARY KEY)')
+    connection.execute(table.delete())
+    try:
+        for start in range(0, len(ids), INSERT_CHUNK_SIZE):
+            connection.execute(table.insert(), [{'id': x} for x in ids[start:start + INSERT_CHUNK_SIZE].tolist()])
+        yield table
+    finally:
+        connection.execute(table.delete())
@@ -2,45 +2,124 @@ import os
 import pickle
 
 from dqt_api import scheduler, models
-from dqt_api.views import get_all_categories, api_filter_chart_helper, remove_values
+from dqt_api.case_index import build_case_index, build_case_index_file, open_case_index, MappedCaseIndex
+from dqt_api.catalog import build_catalog, get_data_generation
+from dqt_api import cube, single_filters
+from dqt_api.dimensions import build_dimension_frame
+from dqt_api.views import get_all_categories, get_chart_data, get_value_owners, \
+    get_tabs_response, get_comments_responses, get_bootstrap_response, get_age_step, get_chart_cells
+
+# startup values stored in `dump.pkl`; increment version when their structure changes
+CACHE_VERSION = 9
+CACHED_KEYS = (
+    'CACHE_VERSION',
+    'DATA_GENERATION',
+    'CATALOG',
+    'POPULATION_SIZE',
+    'PRECOMPUTED_COLUMN',
+    'PRECOMPUTED_FILTER',
+    'NULL_FILTER',
+    'VALUE_OWNERS',
+    'CASE_INDEX',
+    'DIMENSION_FRAME',
+    'SINGLE_FILTERS',
+    'CUBE',
+)
 
 
 def initialize(app, db):
     """Initialize starting values."""
     scheduler.scheduler.add_job(scheduler.remove_old_logs, 'cron', day_of_week=6, id='remove_old_logs')
+    load_cached_values(app, db)
+    app.logger.debug('Compiling tabs, comments, and bootstrap...')
+    get_tabs_response()
+    get_comments_responses()
+    get_bootstrap_response()
+
+
+def load_cached_values(app, db):
+    """Load values from `dump.pkl`, rebuilding them if the cache is missing or out of date."""
     dump_file = os.path.join(app.config['BASE_DIR'], 'dump.pkl')
+    generation = get_data_generation()
     app.logger.info('Attempting to load data from previous cache...')
     try:
         with open(dump_file, 'rb') as fh:
-            population_size, precomputed_column, precomputed_filter, null_filter = pickle.load(fh)
-            app.config['POPULATION_SIZE'] = population_size
-            app.config['PRECOMPUTED_COLUMN'] = precomputed_column
-            app.config['PRECOMPUTED_FILTER'] = precomputed_filter
-            app.config['NULL_FILTER'] = null_filter
-
+            cached = pickle.load(fh)
+        if missing := set(CACHED_KEYS) - set(cached):
+            raise ValueError(f'cache is missing {sorted(missing)}')
+        if cached['CACHE_VERSION'] != CACHE_VERSION:
+            raise ValueError(f'cache version {cached["CACHE_VERSION"]} is out of date')
+        if cached['DATA_GENERATION'] != generation:
+            raise ValueError(f'cache is from a previous data load ({cached["DATA_GENERATION"]} != {generation})')
+        if app.config.get('PRECOMPUTE_SINGLE_FILTERS', False) and cached['SINGLE_FILTERS'] is None:
+            raise ValueError('cache is missing precomputed single filters')
+        if isinstance(cached['CASE_INDEX'], MappedCaseIndex) != app.config.get('CASE_INDEX_MMAP', False):
+            raise ValueError('cache has case index in memory/mapped contrary to CASE_INDEX_MMAP')
+        cube_items = cached['CUBE'].requested_items if cached['CUBE'] is not None else ()
+        if cube_items != tuple(app.config.get('CUBE_ITEMS', ())):
+            raise ValueError(f'cache has aggregate cube for items {cube_items}')
+        app.config.update({key: cached[key] for key in CACHED_KEYS})
         app.logger.info(f'Loaded from file: {dump_file}')
         return
     except Exception as e:
         app.logger.info(f'Failed to load file cache, rebuilding: {e}')
     app.logger.info('Building cache: this may take a few minutes.')
+    app.config['CACHE_VERSION'] = CACHE_VERSION
+    app.config['DATA_GENERATION'] = generation
+    app.logger.debug('Initializing...building catalog...')
+    app.config['CATALOG'] = build_catalog(generation)
     app.logger.debug('Initializing...loading population size...')
     app.config['POPULATION_SIZE'] = db.session.query(models.DataModel).count()
     app.logger.debug('Initializing...precomputing categories...')
     app.config['PRECOMPUTED_COLUMN'] = get_all_categories()
+    app.logger.debug('Initializing...building case index...')
+    if app.config.get('CASE_INDEX_MMAP', False):
+        app.config['CASE_INDEX'] = map_case_index(app, generation)
+    else:
+        app.config['CASE_INDEX'] = build_case_index(generation)
     app.logger.debug('Initializing...building indices...')
-    app.config['PRECOMPUTED_FILTER'] = api_filter_chart_helper(jitter=False)
+    app.config['PRECOMPUTED_FILTER'] = get_chart_data(jitter=False)
     app.logger.debug('Initializing...building null index...')
-    app.config['NULL_FILTER'] = remove_values(app.config['PRECOMPUTED_FILTER'])
+    app.config['NULL_FILTER'] = app.config['PRECOMPUTED_FILTER'].zeroed()
+    app.logger.debug('Initializing...mapping value labels to items...')
+    app.config['VALUE_OWNERS'] = get_value_owners()
+    app.logger.debug('Initializing...building dimension frame...')
+    app.config['DIMENSION_FRAME'] = build_dimension_frame(generation)
+    app.config['SINGLE_FILTERS'] = None
+    if app.config.get('PRECOMPUTE_SINGLE_FILTERS', False):
+        app.logger.debug('Initializing...precomputing single filters...')
+        app.config['SINGLE_FILTERS'] = single_filters.build_single_filter_charts(
+            app.config['CASE_INDEX'], get_chart_cells(), get_age_step(),
+            app.config.get('SINGLE_FILTERS_MAX_BYTES', single_filters.DEFAULT_MAX_BYTES),
+        )
+    app.config['CUBE'] = None
+    if app.config.get('CUBE_ITEMS', None):
+        app.logger.debug('Initializing...building aggregate cube...')
+        app.config['CUBE'] = cube.build_cube(
+            app.config['CASE_INDEX'], get_chart_cells(), get_age_step(), tuple(app.config['CUBE_ITEMS']),
+            app.config.get('CUBE_MAX_BYTES', cube.DEFAULT_MAX_BYTES),
+        )
     app.logger.debug('Finished initializing...')
 
     try:
         with open(dump_file, 'wb') as fh:
-            pickle.dump((
-                app.config['POPULATION_SIZE'],
-                app.config['PRECOMPUTED_COLUMN'],
-                app.config['PRECOMPUTED_FILTER'],
-                app.config['NULL_FILTER']),
-                fh
-            )
+            pickle.dump({key: app.config[key] for key in CACHED_KEYS}, fh)
     except Exception as e:
         app.logger.exception('Failed to write to dump file: {}'.format(e))
+
+
+def map_case_index(app, generation):
+    """Build the case index into `BASE_DIR/case_index/<generation>.bin` and memory-map it (`CASE_INDEX_MMAP`),
+    removing files from previous data loads.
+    """
+    directory = os.path.join(app.config['BASE_DIR'], 'case_index')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{generation}.bin')
+    build_case_index_file(path, generation)
+    for filename in os.listdir(directory):
+        if not filename.startswith(generation):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError as e:  # e.g., still mapped by another process on Windows
+                app.logger.warning(f'Unable to remove old case index: {filename}: {e}')
+    return open_case_index(path)
@@ -22,12 +22,15 @@ from loguru import logger
 from dqt_api import db, app, whooshee
 from dqt_api import models
 from dqt_api.__main__ import prepare_config
+from dqt_api.catalog import save_category_payloads
+from dqt_api.precompiled import touch_stamp
 from dqt_api.utils import clean_text_for_web
 
 TABLES_EXC_USERDATA = [  # user data table should not be dropped/re-created
     models.Variable, models.DataModel, models.Item,
     models.Category, models.Value, models.TabData,
-    models.Comment, models.DataEntry, models.DataFile,
+    models.Comment, models.DataEntry, models.DataFile, models.CategoryPayload,
+    models.ItemValue, models.DimensionLabel, models.CaseDimension,
 ]
 TABLES_EXC_USERDATA_ATTR = [t.__table__ for t in TABLES_EXC_USERDATA]
 
@@ -39,7 +42,7 @@ def main():
                              'BASE_DIR, SECRET_KEY.')
     parser.add_argument('--method', choices=('manage', 'create', 'createuserdata', 'load', 'delete',
                                              'overload', 'reindex', 'tabs', 'drop',
-                                             'recreate'),
+                                             'recreate', 'payloads'),
                         default='manage',
                         help='Operation to perform.')
     parser.add_argument('--count', nargs='*', type=int,
@@ -77,13 +80,16 @@ def main():
         reindex()
     elif args.method == 'tabs':
         update_tabs(args.file)
+    elif args.method == 'payloads':
+        with app.app_context():
+            save_category_payloads()
 
 
 def update_tabs(fp):
     with app.app_context():
         db.session.query(models.TabData).delete()
         db.session.commit()
-        add_tabs(fp)
+        add_tabs(fp)  # also marks compiled tabs as stale
 
 
 def reindex():
@@ -336,6 +342,7 @@ def load(count):
     for case in graph_data:
         db.session.add(models.DataModel(case=case, **graph_data[case]))
     db.session.commit()
+    save_category_payloads()
 
 
 def delete():
@@ -370,6 +377,7 @@ def add_tabs(tab_file):
                                line=i, order=int(tab_order), text_type=text_type)
             db.session.add(t)
     db.session.commit()
+    touch_stamp('tabs')
     logger.info(f'Tabs committed to database.')
 
 
@@ -392,6 +400,7 @@ def add_comments(comment_file):
             c = models.Comment(location=location, line=line_number, comment=comment)
             db.session.add(c)
     db.session.commit()
+    touch_stamp('comments')
     logger.info(f'Comments committed to database.')
 
 
@@ -4,7 +4,17 @@ SQLAlchemy-style models for building backend database.
 
 from datetime import datetime
 
+import sqlalchemy
+import whoosh.fields
+import whoosh.query
+
 from dqt_api import db, whooshee
+from dqt_api.flask_whooshee import AbstractWhoosheerMeta
+
+
+def has_table(model):
+    """Whether the model's table exists (tables added in later versions may not yet be created)"""
+    return sqlalchemy.inspect(db.engine).has_table(model.__tablename__)
 
 
 class Variable(db.Model):
@@ -37,7 +47,7 @@ class Item(db.Model):
     int_range_start = db.Column(db.Integer)
     int_range_end = db.Column(db.Integer)
     int_range_step = db.Column(db.Integer)
-    values = db.Column(db.String(500))
+    values = db.Column(db.String(500))  # deprecated: see `ItemValue`
     rounded = db.Column(db.Integer)  # rounded precision (e.g., 5)
 
 
@@ -53,7 +63,8 @@ class Category(db.Model):
     order = db.Column(db.SmallInteger)
 
 
-# @whooshee.register_model('name', 'description')
+# not registered with `register_model`: one document per row would repeat the same labels for every item,
+#   see `ValueLabelWhoosheer` for the deduplicated index
 class Value(db.Model):
     """A possible value for an item.
     At the moment, this will even include values when there is a decimal range/natural ordering.
@@ -81,6 +92,54 @@ class Value(db.Model):
         return self.name if self.name_numeric is None else self.name_numeric
 
 
+@whooshee.register_whoosheer
+class ValueLabelWhoosheer(AbstractWhoosheerMeta):
+    """Search index over distinct, non-numeric value labels (e.g., 'hispanic').
+    Labels are mapped back to their values/items/categories with `VALUE_OWNERS` (see `get_value_owners`).
+    """
+    index_subdir = 'value_label'
+    auto_update = False  # loader inserts a Value per item, so only build with `reindex`
+    models = [Value]
+    schema = whoosh.fields.Schema(
+        label=whoosh.fields.ID(stored=True, unique=True),
+        name=whoosh.fields.TEXT,
+    )
+
+    @classmethod
+    def reindex_all(cls, writer):
+        writer.delete_by_query(whoosh.query.Every())
+        labels = {
+            normalize_label(name) for name, in
+            db.session.query(Value.name).filter(Value.name_numeric.is_(None)).distinct()
+        }
+        for label in labels:
+            if label:
+                writer.add_document(label=label, name=label)
+
+
+def normalize_label(name):
+    return (name or '').strip().lower()
+
+
+class ItemValue(db.Model):
+    """Values which an item takes in the data, in display order, along with the number of cases.
+    Written by the loader (replaces the 500-character `Item.values`).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    item = db.Column(db.Integer, db.ForeignKey('item.id'), index=True)
+    value = db.Column(db.Integer, db.ForeignKey('value.id'))
+    order = db.Column(db.Integer)  # position within the item
+    count = db.Column(db.Integer)  # number of cases with this value
+
+
+class CategoryPayload(db.Model):
+    """Category response (items with their values/ranges) materialized after loading.
+    See `catalog.save_category_payloads`.
+    """
+    category = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    payload = db.Column(db.Text)  # json
+
+
 class DataModel(db.Model):
     """Data table for graphing/other tables.
     This table must be modified to extract additional information for graphs/tables
@@ -93,6 +152,22 @@ class DataModel(db.Model):
     followup_years = db.Column(db.Integer)
 
 
+class DimensionLabel(db.Model):
+    """Labels for additional `DataModel` dimensions (`DATA_MODEL_DIMENSIONS` in config), e.g., race.
+    Each dimension's labels are numbered by `code`.
+    """
+    dimension = db.Column(db.String(50), primary_key=True)
+    code = db.Column(db.SmallInteger, primary_key=True)
+    label = db.Column(db.String(100))
+
+
+class CaseDimension(db.Model):
+    """Dictionary-encoded value (`DimensionLabel.code`) of an additional dimension for each case"""
+    case = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(50), primary_key=True)
+    code = db.Column(db.SmallInteger)
+
+
 class UserData(db.Model):
     """Table for collecting information for the users.
     """
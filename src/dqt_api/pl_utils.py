@@ -1,21 +1,21 @@
 import math
 from collections import Counter
-from itertools import zip_longest
 
+import numpy as np
 import polars as pl
+from sqlalchemy import select
 
-from dqt_api import db, app, models
-
-
-def chunker(iterable, chunk_size, fillvalue=None):
-    return zip_longest(*[iter(iterable)] * chunk_size, fillvalue=fillvalue)
+from dqt_api import app, models
+from dqt_api.id_sets import execute_with_ids
 
 
 def load_cases_to_polars(cases):
-    """Load DataModel rows for the given case ids into a Polars DataFrame efficiently."""
-    # Cast to a concrete list of ints (cases may be a set)
-    case_ids = list(cases or [])
-    if not case_ids:
+    """Load DataModel rows for the given case ids into a Polars DataFrame efficiently.
+
+    :param cases: case ids, preferably a numpy array (as returned by `parse_arg_list`)
+    """
+    case_ids = cases if isinstance(cases, np.ndarray) else np.fromiter(cases or (), dtype=np.int64)
+    if not len(case_ids):
         return pl.DataFrame({
             'case': pl.Series([], dtype=pl.Int64),
             'age_bl': pl.Series([], dtype=pl.Int64),
@@ -35,39 +35,18 @@ def load_cases_to_polars(cases):
         'enrollment': pl.Utf8,
         'followup_years': pl.UInt8,
     }
-    # Chunk the IN clause to avoid DB parameter limits
-    for case_chunk in chunker(case_ids, 2000):
-        chunk = [c for c in case_chunk if c is not None]
-        if not chunk:
-            continue
-        q = (
-            db.session.query(
-                models.DataModel.case,
-                models.DataModel.age_bl,
-                models.DataModel.age_fu,
-                models.DataModel.sex,
-                models.DataModel.enrollment,
-                models.DataModel.followup_years,
-            )
-            .filter(models.DataModel.case.in_(chunk))
-            .yield_per(10000)  # stream rows from DB cursor
-        )
-        # Build rows directly as dicts (no ORM instance hydration)
-        rows = (
-            {
-                'case': r.case,
-                'age_bl': r.age_bl,
-                'age_fu': r.age_fu,
-                'sex': r.sex,
-                'enrollment': r.enrollment,
-                'followup_years': r.followup_years,
-            }
-            for r in q
-        )
-        # Materialize this chunk (Polars needs a concrete sequence)
-        rows_list = list(rows)
-        if rows_list:
-            dfs.append(pl.DataFrame(rows_list, schema=schema))
+    # join to the case ids sent in one statement (see `id_sets`) and stream rows from the DB cursor
+    statement = select(
+        models.DataModel.case,
+        models.DataModel.age_bl,
+        models.DataModel.age_fu,
+        models.DataModel.sex,
+        models.DataModel.enrollment,
+        models.DataModel.followup_years,
+    )
+    for partition in execute_with_ids(statement, models.DataModel.case, case_ids):
+        # Row tuples go straight into Polars (no per-row dicts)
+        dfs.append(pl.DataFrame(partition, schema=schema, orient='row'))
 
     if not dfs:
         return pl.DataFrame(schema=schema)
@@ -0,0 +1,101 @@
+"""
+Responses which only change when the data is reloaded are compiled once into bytes
+(and optionally gzip) and streamed with Content-Length and ETag headers.
+
+Content edited outside of a data load (e.g., tabs via `manage.py --method tabs`) is tracked by
+stamp files in `BASE_DIR`: touching the stamp makes every worker process recompile it.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+from loguru import logger
+
+from dqt_api import app
+
+CHUNK_SIZE = 64 * 1024
+MIN_GZIP_SIZE = 1024  # not worth compressing smaller responses
+
+_compiled = {}  # name -> (key, PrecompiledResponse)
+_lock = threading.Lock()
+
+
+class PrecompiledResponse(object):
+    __slots__ = ('body', 'gzip_body', 'etag', 'mimetype')
+
+    def __init__(self, body, mimetype='application/json', compress=True):
+        self.body = body
+        self.gzip_body = gzip.compress(body) if compress and len(body) >= MIN_GZIP_SIZE else None
+        self.etag = hashlib.md5(body).hexdigest()
+        self.mimetype = mimetype
+
+    @classmethod
+    def from_json(cls, data, **kwargs):
+        return cls(json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf8') + b'\n', **kwargs)
+
+    def to_response(self):
+        """Build response for the current request (handles If-None-Match and Accept-Encoding)."""
+        if request.if_none_match.contains(self.etag):
+            response = Response(status=304)
+            response.set_etag(self.etag)
+            return response
+        use_gzip = self.gzip_body is not None and 'gzip' in request.accept_encodings
+        body = self.gzip_body if use_gzip else self.body
+        response = Response(iter_chunks(body), mimetype=self.mimetype, direct_passthrough=True)
+        response.headers['Content-Length'] = str(len(body))
+        response.headers['Vary'] = 'Accept-Encoding'
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(self.etag)
+        return response
+
+
+def iter_chunks(body, chunk_size=CHUNK_SIZE):
+    view = memoryview(body)
+    for i in range(0, len(body), chunk_size):
+        yield view[i:i + chunk_size]
+
+
+def get_precompiled(name, key, builder):
+    """Get the compiled response `name`, calling `builder()` if it has not yet been built for `key`
+    (e.g., the data generation). Only the latest key is retained for each name.
+
+    :param builder: function returning a `PrecompiledResponse` (or a mapping of them)
+    """
+    compiled = _compiled.get(name, None)
+    if compiled is not None and compiled[0] == key:
+        return compiled[1]
+    with _lock:
+        compiled = _compiled.get(name, None)
+        if compiled is None or compiled[0] != key:
+            compiled = (key, builder())
+            _compiled[name] = compiled
+    return compiled[1]
+
+
+def _get_stamp_path(name):
+    return os.path.join(app.config['BASE_DIR'], f'{name}.stamp')
+
+
+def get_stamp(name):
+    """Version of the content `name` (0 if the stamp has never been touched)."""
+    try:
+        return os.stat(_get_stamp_path(name)).st_mtime_ns
+    except (OSError, KeyError):
+        return 0
+
+
+def touch_stamp(name):
+    """Record that the content `name` has changed so that compiled responses are rebuilt."""
+    try:
+        path = _get_stamp_path(name)
+        now = time.time_ns()
+        with open(path, 'w') as fh:
+            fh.write(str(now))
+        os.utime(path, ns=(now, now))
+    except (OSError, KeyError) as e:
+        logger.warning(f'Unable to update stamp for {name}: {e}')
@@ -0,0 +1,129 @@
+"""
+Unjittered chart aggregates (see `charts.ChartCells`) for every single filter, built after a data load.
+
+Within each item, the case index's pairs are reordered by numeric value (then value id), and the
+aggregates of the pairs are stored as one running sum. Any numeric range is a contiguous run of
+pairs, so its aggregates are the difference of two rows; a set of values sums the differences.
+Summing is only valid when no case has two values of the item (`single_valued`): otherwise only
+filters on one value are answered.
+
+Aggregates are integral (counts and sums of whole follow-up years), so the running sums are stored
+as uint32 and only for the aggregate cells which are nonzero for the whole population. Items are
+included from fewest values up until the tables would exceed `SINGLE_FILTERS_MAX_BYTES`; filters on
+the other items fall back to selecting cases.
+"""
+import numpy as np
+from loguru import logger
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+COUNT_DTYPE = np.uint32
+
+
+class SingleFilterCharts(object):
+    """
+    pair_order: case index pairs within each item in (numeric value, value id) order
+    shape: aggregate shape
+    used_cells: flat indices (into the aggregate shape) of the stored cells
+    item_rows: item id -> first row of the item's running sum in `cumulative`
+    cumulative: for each included item, a row of zeros followed by the running sum (of the used cells)
+        of the aggregates of its pairs in `pair_order`
+    single_valued: sorted item ids for which no case has more than one value
+    """
+    __slots__ = ('generation', 'age_bins', 'pair_order', 'shape', 'used_cells', 'item_rows', 'cumulative',
+                 'single_valued')
+
+    def __init__(self, generation, age_bins, pair_order, shape, used_cells, item_rows, cumulative, single_valued):
+        self.generation = generation
+        self.age_bins = age_bins
+        self.pair_order = pair_order
+        self.shape = shape
+        self.used_cells = used_cells
+        self.item_rows = item_rows
+        self.cumulative = cumulative
+        self.single_valued = single_valued
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, attr in zip(self.__slots__, state):
+            setattr(self, name, attr)
+
+    def is_single_valued(self, item_id):
+        i = np.searchsorted(self.single_valued, item_id)
+        return i < len(self.single_valued) and self.single_valued[i] == item_id
+
+    def lookup(self, case_index, item_id, val):
+        """Number of selected cases and aggregates for the filter `item_id=val`
+
+        :return: (selected, aggregates), or None if it cannot be answered from the stored aggregates
+        :raises ValueError: if `val` cannot be parsed
+        """
+        if item_id not in self.item_rows:
+            return None
+        lo, hi, selected = case_index.select_pairs(item_id, val)
+        positions = np.flatnonzero(selected[self.pair_order[lo:hi] - lo])  # within the item, in pair_order
+        if len(positions) > 1 and not self.is_single_valued(item_id):
+            return None
+        pairs = self.pair_order[positions + lo]
+        n_cases = int((case_index.pair_start[pairs + 1] - case_index.pair_start[pairs]).sum())
+        rows = positions + self.item_rows[item_id]
+        if len(positions) == 0:
+            used = np.zeros(len(self.used_cells), dtype=np.int64)
+        elif positions[-1] - positions[0] + 1 == len(positions):  # contiguous (e.g., a range)
+            used = self.cumulative[rows[-1] + 1].astype(np.int64) - self.cumulative[rows[0]]
+        else:
+            used = (self.cumulative[rows + 1].astype(np.int64) - self.cumulative[rows]).sum(axis=0)
+        aggregates = np.zeros(self.shape, dtype=np.float64)
+        aggregates.flat[self.used_cells] = used
+        return n_cases, aggregates
+
+
+def build_single_filter_charts(case_index, cells, age_bins, max_bytes=DEFAULT_MAX_BYTES):
+    """Aggregates of every (item, value) pair of the case index, for the frame's chart cells
+
+    :return: `SingleFilterCharts` (without any items if none could be included)
+    """
+    logger.info('Precomputing single filter charts.')
+    pair_order = np.lexsort((case_index.pair_value, case_index.pair_numeric, case_index.pair_item))
+    population = cells.aggregate_groups(np.zeros(case_index.size, dtype=np.int64), 1)[0]
+    shape = population.shape
+    used_cells = np.flatnonzero(population)
+    item_ids = np.unique(case_index.pair_item)
+    single_valued = _single_valued_items(case_index, item_ids)
+    followup = cells.followup[~np.isnan(cells.followup)]
+    if np.any(followup != np.round(followup)) or np.any(followup < 0):
+        logger.warning('Skipping single filter charts: follow-up years are not all whole non-negative numbers.')
+        return SingleFilterCharts(case_index.generation, age_bins, pair_order, shape, used_cells, {},
+                                  np.zeros((0, len(used_cells)), dtype=COUNT_DTYPE), single_valued)
+    row_bytes = len(used_cells) * np.dtype(COUNT_DTYPE).itemsize
+    item_ranges = sorted((case_index.item_pairs(item_id) for item_id in item_ids.tolist()),
+                         key=lambda r: r[1] - r[0])
+    blocks, item_rows, n_rows = [], {}, 0
+    for lo, hi in item_ranges:
+        item_id = int(case_index.pair_item[lo])
+        if (n_rows + hi - lo + 1) * row_bytes > max_bytes:
+            logger.warning(f'Skipping single filter charts for item {item_id}: would exceed {max_bytes} bytes.')
+            continue
+        aggregates = cells.aggregate_pairs(case_index, lo, hi).reshape(hi - lo, -1)[:, used_cells]
+        block = np.zeros((hi - lo + 1, len(used_cells)), dtype=np.float64)
+        np.cumsum(aggregates[pair_order[lo:hi] - lo], axis=0, out=block[1:])
+        if block[-1].max(initial=0) >= np.iinfo(COUNT_DTYPE).max:
+            logger.warning(f'Skipping single filter charts for item {item_id}: totals exceed 32 bits.')
+            continue
+        item_rows[item_id] = n_rows
+        blocks.append(block.astype(COUNT_DTYPE))
+        n_rows += hi - lo + 1
+    cumulative = np.concatenate(blocks) if blocks else np.zeros((0, len(used_cells)), dtype=COUNT_DTYPE)
+    logger.info(f'Precomputed single filter charts: {len(item_rows)} of {len(item_ids)} items,'
+                f' {n_rows - len(item_rows)} values, {cumulative.nbytes} bytes.')
+    return SingleFilterCharts(case_index.generation, age_bins, pair_order, shape, used_cells, item_rows,
+                              cumulative, single_valued)
+
+
+def _single_valued_items(case_index, item_ids):
+    """Items (of sorted `item_ids`) none of whose cases appear in more than one of its pairs"""
+    entry_items = np.searchsorted(item_ids, np.repeat(case_index.pair_item, np.diff(case_index.pair_start)))
+    distinct = np.unique(entry_items.astype(np.int64) * max(case_index.size, 1) + case_index.case_pos)
+    n_distinct = np.bincount(distinct // max(case_index.size, 1), minlength=len(item_ids))
+    return item_ids[n_distinct == np.bincount(entry_items, minlength=len(item_ids))]
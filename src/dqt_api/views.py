@@ -1,24 +1,34 @@
+import base64
+import hashlib
+import json
+import math
 import os
 import random
 import string
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 from functools import lru_cache
-from io import BytesIO
-from itertools import zip_longest
 
 import datetime
 
-import copy
-
 import sqlalchemy
-from flask import request, jsonify, send_file
+from flask import request, jsonify, send_file, abort, Response
+import numpy as np
 from loguru import logger
-from sqlalchemy import inspect, text
-
-from dqt_api import db, app, models
+from sqlalchemy import inspect
+
+from dqt_api import db, app, models, whooshee
+from dqt_api.case_index import build_case_index
+from dqt_api.catalog import build_catalog
+from dqt_api.chart_format import CHART_FORMATS, JSON_MIMETYPE, available_mimetypes, compact_chart, encode_chart, \
+    legacy_chart
+from dqt_api.charts import ChartCells, ChartData, render_chart
+from dqt_api.codebook import iter_codebook_rows, iter_csv, write_xlsx
+from dqt_api.dimensions import build_dimension_frame
 from dqt_api.pl_utils import load_cases_to_polars, censored_histogram_by_age_pl2
+from dqt_api.precompiled import PrecompiledResponse, get_precompiled, get_stamp
 
 
 class LoguruHandler(logging.Handler):
@@ -27,34 +37,34 @@ class LoguruHandler(logging.Handler):
         logger_opt.log(record.levelno, record.getMessage())
 
 
-def remove_values(f):
-    new_subject_counts = copy.deepcopy(f[0])
-    new_sex_data_bl = copy.deepcopy(f[1])
-    new_sex_data_fu = copy.deepcopy(f[2])
-    for i in range(len(new_subject_counts)):
-        new_subject_counts[i]['value'] = 0
-    for i in range(len(new_sex_data_bl['datasets'])):
-        new_sex_data_bl['datasets'][i]['data'] = [0] * len(new_sex_data_bl['datasets'][i]['data'])
-    for i in range(len(new_sex_data_fu['datasets'])):
-        new_sex_data_fu['datasets'][i]['data'] = [0] * len(new_sex_data_fu['datasets'][i]['data'])
-    new_sex_data_bl_g = get_google_chart(new_sex_data_bl)
-    new_sex_data_fu_g = get_google_chart(new_sex_data_fu)
-    return new_subject_counts, new_sex_data_bl, new_sex_data_fu, new_sex_data_bl_g, new_sex_data_fu_g
-
-
 def jitter_and_mask_value_by_date(value, mask=0, label=''):
     """Add/subtract small increment from value. If resulting `new_value` <= mask, set the result to 0."""
     salt = app.config.get('JITTER', 'DEFAULT')
     noise_min = app.config.get('JITTER_MIN', -2)
     noise_max = app.config.get('JITTER_MAX', 2)
-    year, week, _ = datetime.date.today().isocalendar()
-    seed_str = f'{year}-W{week}_{label}_{salt}'
+    seed_str = f'{get_jitter_week()}_{label}_{salt}'
     incr = hash(seed_str) % (noise_max - noise_min + 1) + noise_min
     # incr = (int(hashlib.sha256(seed_str.encode()).hexdigest(), 16) % (noise_max - noise_min + 1)) + noise_min
     new_value = incr + value
     return masker(new_value, mask)
 
 
+def get_jitter_week():
+    """Jittered values are constant within an ISO week"""
+    year, week, _ = datetime.date.today().isocalendar()
+    return f'{year}-W{week}'
+
+
+def jitter_and_mask(value, mask=0, label='', jitter=True):
+    """
+    Apply jitter function unless:
+    * function is called with jitter=False (when precomputing)
+    * or, if config contains JITTER=None
+    """
+    return (masker(value, mask) if jitter is False or not app.config.get('JITTER', True)
+            else jitter_and_mask_value_by_date(value, mask, label))
+
+
 def masker(value, mask=0):
     return value if value > mask else 0
 
@@ -107,50 +117,91 @@ def _search(target):
             })
     except sqlalchemy.exc.ProgrammingError as pe:
         app.logger.warning(f'Search {target} found no items: {pe}')
+    # search value labels: return the owning item(s)
+    value_owners = app.config.get('VALUE_OWNERS') or {}
+    for label in models.ValueLabelWhoosheer.search(target, values_of='label'):
+        for value_id, value_name, item_id, item_name, category_id in value_owners.get(label, ()):
+            terms.append({
+                'type': 'value',
+                'id': value_id,
+                'name': value_name,
+                'description': item_name,
+                'categoryId': category_id,
+                'itemId': item_id,
+            })
     return {'search': terms}
 
 
+def get_value_owners():
+    """Map each non-numeric value label to its values, items and categories (see `Catalog.value_owners`)."""
+    return get_catalog().value_owners()
+
+
+def current_generation():
+    """Identifier of the currently loaded data (see `catalog.get_data_generation`)."""
+    return app.config.get('DATA_GENERATION', None) or get_catalog().generation
+
+
+def get_case_index():
+    """Resident index of `Variable` for vectorized filtering/counting; built on first use if not loaded at startup."""
+    if app.config.get('CASE_INDEX', None) is None:
+        app.config['CASE_INDEX'] = build_case_index(current_generation())
+    return app.config['CASE_INDEX']
+
+
+def get_dimension_frame():
+    """Resident, integer-coded `DataModel`; built on first use if not loaded at startup."""
+    if app.config.get('DIMENSION_FRAME', None) is None:
+        app.config['DIMENSION_FRAME'] = build_dimension_frame(current_generation())
+    return app.config['DIMENSION_FRAME']
+
+
+def get_chart_cells():
+    """Chart aggregate cells for the resident frame (depends on the age bins)"""
+    return _get_chart_cells(current_generation(), get_age_step())
+
+
+@lru_cache(maxsize=1)
+def _get_chart_cells(generation, age_bins):
+    return ChartCells(get_dimension_frame(), get_case_index(), age_bins)
+
+
+def get_precomputed_aggregates(name):
+    """Aggregates precomputed at startup (`SINGLE_FILTERS` or `CUBE`), if built for the current data and age bins"""
+    precomputed = app.config.get(name, None)
+    if precomputed is None or precomputed.generation != current_generation() \
+            or precomputed.age_bins != get_age_step():
+        return None
+    return precomputed
+
+
+def get_catalog():
+    """Resident catalog of categories/items/values; built on first use if not loaded at startup."""
+    if app.config.get('CATALOG', None) is None:
+        app.config['CATALOG'] = build_catalog()
+    return app.config['CATALOG']
+
+
+@app.route('/api/search/metrics', methods=['GET'])
+def search_metrics():
+    """Searcher reuse and refresh latency for each search index."""
+    return jsonify(whooshee.searcher_metrics())
+
+
 @lru_cache(maxsize=256)
 def parse_arg_list(arg_list):
-    cases = None
-    no_results_flag = None
-    for key, val in arg_list:
-        if '~' in val:
-            val = val.split('~')
-            q = db.session.query(models.Variable.case).join(
-                models.Value
-            ).filter(
-                models.Variable.item == key
-            )
-            if val[0] and val[1]:
-                q = q.filter(models.Value.name_numeric.between(float(val[0]), float(val[1])))
-            elif val[0]:
-                q = q.filter(models.Value.name_numeric >= float(val[0]))
-            elif val[1]:
-                q = q.filter(models.Value.name_numeric <= float(val[1]))
-            else:
-                pass
-            cases_ = set(q.all())
-        else:
-            val = val.split('_')
-            cases_ = set(
-                db.session.query(models.Variable.case).filter(
-                    models.Variable.item == key,
-                    models.Variable.value.in_(val)
-                ).all()
-            )
-        if cases is None:
-            cases = cases_
-        else:
-            cases &= cases_
-    if not cases:
-        if cases is None:
-            no_results_flag = False  # there was no query/empty query
-            cases = db.session.query(models.Variable.case).all()
-        else:
-            no_results_flag = True  # this query has returned no results
-    cases = {x[0] for x in list(cases)} if cases else None
-    return cases, no_results_flag
+    """Cases matching the filters from the case index postings: sorted case ids (int64 array, None if there
+    are none) and whether there were no filters (False) or no results (True)
+
+    :raises ValueError: if a filter cannot be parsed (e.g., a non-numeric item or value id)
+    """
+    case_index = get_case_index()
+    positions = case_index.positions(arg_list)
+    if positions is None:
+        return (case_index.cases if case_index.size else None), False
+    if len(positions) == 0:
+        return None, True
+    return case_index.cases[positions], None
 
 
 @lru_cache(maxsize=32)
@@ -197,9 +248,22 @@ def _get_age_step(age_step, age_min, age_max, ages):
 
 @app.route('/api/filter/export', methods=['GET'])
 def api_filter_export():
+    # filters are ANDed, so their order does not matter: sort them for a single cache entry
+    filters = get_filter_export(tuple(sorted(get_arg_list())), current_generation())
+    app.logger.info(f'Exporting parameters: {filters}')
+    return jsonify({'filterstring': ' AND '.join(filters)})
+
+
+@lru_cache(maxsize=256)
+def get_filter_export(arg_list, generation):
+    """Build export filters using the catalog's names (no per-filter/per-value queries)."""
+    catalog = get_catalog()
     filters = []
-    for key, [val, *_] in request.args.lists():
-        item = db.session.query(models.Item.varname).filter_by(id=key).first()[0]
+    for key, val in arg_list:
+        try:
+            item = catalog.items[int(key)].varname
+        except (KeyError, ValueError):
+            abort(404, description=f'Unknown item: {key}')
         if '~' in val:
             low_val, high_val = val.split('~')
             if high_val and low_val:
@@ -209,15 +273,30 @@ def api_filter_export():
             elif low_val:
                 filters.append(f'({item} >= {low_val})')
         else:
-            subfilters = []
-            for v in val.split('_'):
-                subfilters.append(db.session.query(models.Value.name).filter_by(id=v).first()[0])
+            try:
+                subfilters = [catalog.values[int(v)].name for v in val.split('_')]
+            except (KeyError, ValueError):
+                abort(404, description=f'Unknown value for item {key}: {val}')
             if len(subfilters) > 1:
                 filters.append(f'({item} IN ({", ".join(subfilters)}))')
             else:
                 filters.append(f'({item} = {subfilters[0]})')
-    app.logger.info(f'Exporting parameters: {filters}')
-    return jsonify({'filterstring': ' AND '.join(filters)})
+    return tuple(filters)
+
+
+def get_arg_list(exclude=()):
+    """Filters from the query string as hashable (item, value) pairs: the key for the filter caches
+
+    :param exclude: query parameters which are not filters
+    """
+    return tuple((key, val) for key, [val, *_] in request.args.lists() if key not in exclude)
+
+
+def get_selected_case_ids(arg_list):
+    """Sorted case ids matching the filters (same cases as `parse_arg_list`) from the case index"""
+    case_index = get_case_index()
+    mask = case_index.mask(arg_list)
+    return case_index.cases if mask is None else case_index.case_ids(mask)
 
 
 def get_update_date_text():
@@ -229,21 +308,270 @@ def get_update_date_text():
 
 @app.route('/api/filter/chart', methods=['GET'])
 def api_filter_chart(jitter=True):
-    arg_list = tuple((key, val) for key, [val, *_] in request.args.lists())
-    (subject_counts, _, _,
-     sex_data_bl_g, sex_data_fu_g) = api_filter_chart_helper(jitter, arg_list)
-    return jsonify({
+    """Charts for the current selection: JSON by default, or a compact format (see `chart_format`)
+    with `?format=v2|msgpack` or the corresponding `Accept` header.
+    """
+    mimetype = get_chart_mimetype()
+    arg_list = get_arg_list(exclude=('format',))
+    try:
+        if mimetype == JSON_MIMETYPE:
+            response = jsonify(get_filter_chart_data(arg_list, jitter))
+        else:
+            response = get_filter_chart_compact(arg_list, mimetype, current_generation(), get_jitter_week(),
+                                                jitter).to_response()
+    except ValueError as e:
+        abort(400, description=f'Invalid filter: {e}')
+    response.vary.add('Accept')
+    return response
+
+
+def get_chart_mimetype():
+    """Mimetype for the chart response: `?format=` takes precedence over `Accept`"""
+    chart_format = request.args.get('format', None)
+    if chart_format is None:
+        return request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+    mimetype = CHART_FORMATS.get(chart_format, None)
+    if mimetype is None:
+        abort(400, description=f'Format must be one of: {", ".join(CHART_FORMATS)}')
+    if mimetype not in available_mimetypes():
+        abort(406, description=f'Format not available: {chart_format}')
+    return mimetype
+
+
+@lru_cache(maxsize=256)
+def get_filter_chart_compact(arg_list, mimetype, generation, week, jitter=True):
+    """Encoded compact chart (generation/week are only cache keys)"""
+    return PrecompiledResponse(encode_chart(compact_chart(get_chart_data(jitter, arg_list)), mimetype),
+                               mimetype=mimetype)
+
+
+def get_filter_chart_data(arg_list, jitter=True):
+    return chart_json(get_chart_data(jitter, arg_list))
+
+
+def chart_json(chart):
+    """Default JSON response for `ChartData`"""
+    subject_counts, _, _, sex_data_bl_g, sex_data_fu_g = legacy_chart(chart)
+    return {
         'subject_counts': subject_counts,
         'age_bl_g': sex_data_bl_g,
         'age_fu_g': sex_data_fu_g,
-    })
+    }
+
+
+@app.route('/api/filter/count', methods=['GET'])
+def api_filter_count():
+    """Size of the current selection only"""
+    try:
+        count = get_filter_count(get_arg_list(), current_generation(), get_jitter_week())
+    except ValueError as e:
+        abort(400, description=f'Invalid filter: {e}')
+    return jsonify({'count': count})
+
+
+@lru_cache(maxsize=256)
+def get_filter_count(arg_list, generation, week, jitter=True):
+    """Number of selected subjects as shown in the chart ('selected-count': the jittered and masked age bins),
+    rendered from the resident aggregates of the selected cases (see `charts.render_chart`) without
+    reading `DataModel`
+    """
+    def jitter_and_mask_function(x, mask=0, label=''):
+        return jitter_and_mask(x, mask, label, jitter)
+
+    case_index = get_case_index()
+    mask = case_index.mask(arg_list)
+    selected = case_index.size if mask is None else int(np.count_nonzero(mask))
+    chart = get_stored_chart(selected, mask is not None)
+    if chart is None:
+        cells = get_chart_cells()
+        rows = cells.rows_for(np.ones(case_index.size, dtype=bool) if mask is None else mask)
+        mask_value = app.config.get('MASK', 0)
+        chart = format_chart(*render_chart(cells, cells.aggregate(rows), jitter_and_mask_function, mask_value),
+                             True if mask is not None and selected == 0 else None, jitter_and_mask_function,
+                             mask_value)
+    return chart.row_value('selected-count')
+
+
+@app.route('/api/filter/facets', methods=['GET'])
+def api_filter_facets():
+    """Number of selected subjects with each value of every categorical item (e.g., to show beside checkboxes)"""
+    try:
+        facets = get_filter_facets(get_arg_list(), current_generation(), get_jitter_week())
+    except ValueError as e:
+        abort(400, description=f'Invalid filter: {e}')
+    return jsonify({'facets': facets})
+
+
+@lru_cache(maxsize=64)
+def get_filter_facets(arg_list, generation, week, jitter=True):
+    """Jittered and masked counts for the selection: {item_id: {value_id: count}}
+
+    Each item's counts ignore the item's own filter (the selection if only that filter changed, e.g.,
+    another value were checked), so the counts come from the case index (see `CaseIndex.pair_counts`)
+    under the mask of all filters for unfiltered items, and of the other filters for each filtered item.
+    """
+    catalog = get_catalog()
+    case_index = get_case_index()
+    item_ids = [item.id for item in catalog.items.values() if not item.range and item.value_ids]
+    filter_masks = [(int(key), case_index.filter_mask(int(key), val)) for key, val in arg_list]
+    filtered = {item_id for item_id, _ in filter_masks}
+    counts = case_index.value_counts([x for x in item_ids if x not in filtered], _combine_masks(filter_masks))
+    for item_id in filtered & set(item_ids):
+        counts.update(case_index.value_counts(
+            [item_id], _combine_masks([(key, mask) for key, mask in filter_masks if key != item_id]),
+        ))
+    mask_value = app.config.get('MASK', 0)
+    facets = {}
+    for item_id in item_ids:
+        item_counts = counts[item_id]
+        facets[str(item_id)] = item_facets = {}
+        for value_id in catalog.items[item_id].value_ids:
+            count = item_counts.get(value_id, 0)
+            if count:  # values without any selected subjects are not jittered
+                count = jitter_and_mask(count, mask_value, f'facet-{item_id}-{value_id}', jitter)
+            item_facets[str(value_id)] = count
+    return facets
+
+
+def _combine_masks(filter_masks):
+    """Intersection of the masks of [(item_id, mask), ...] (None if there are none)"""
+    mask = None
+    for _, item_mask in filter_masks:
+        mask = item_mask if mask is None else mask & item_mask
+    return mask
+
+
+CROSSTAB_PARAMS = ('rows', 'cols', 'layers')
+
+
+@app.route('/api/filter/crosstab', methods=['GET'])
+def api_filter_crosstab():
+    """Table of selected subjects by `DataModel` dimensions: `?rows=sex&cols=enrollment[&layers=age_bl]&<filters>`"""
+    dimensions = tuple(request.args[param] for param in CROSSTAB_PARAMS if request.args.get(param))
+    available = get_dimension_frame().dimensions
+    if not dimensions or len(set(dimensions)) < len(dimensions) or set(dimensions) - set(available):
+        abort(400, description=f'Specify distinct rows/cols/layers from: {", ".join(available)}')
+    try:
+        crosstab = get_crosstab_data(dimensions, get_arg_list(exclude=CROSSTAB_PARAMS),
+                                     current_generation(), get_jitter_week())
+    except ValueError as e:
+        abort(400, description=f'Invalid filter: {e}')
+    return jsonify(crosstab)
+
+
+@lru_cache(maxsize=256)
+def get_crosstab_data(dimensions, arg_list, generation, week, jitter=True):
+    frame = get_dimension_frame()
+    rows = frame.rows_for(get_selected_case_ids(arg_list))
+    counts, labels = frame.crosstab(dimensions, rows, age_bins=get_age_step())
+    mask_value = app.config.get('MASK', 0)
+    masked = np.zeros(counts.shape, dtype=np.int64)
+    for index, count in np.ndenumerate(counts):
+        if count:  # cells without any selected subjects are not jittered
+            label = '|'.join(str(labels[axis][i]) for axis, i in enumerate(index))
+            masked[index] = jitter_and_mask(int(count), mask_value, f'crosstab-{label}', jitter)
+    return {
+        'dimensions': list(dimensions),
+        'labels': [list(x) for x in labels],
+        'counts': masked.tolist(),
+    }
+
+
+@app.route('/api/filter/compare', methods=['POST'])
+def api_filter_compare():
+    """Charts for several cohorts at once. Expects JSON with a filter set for each cohort:
+        {"cohorts": [{"12": "34", "56": "1~10"}, {"12": "35", "56": "1~10"}]}
+    Returns the `/api/filter/chart` response of each cohort in the same order: {"cohorts": [...]}
+    """
+    data = request.get_json(silent=True) or {}
+    cohorts = data.get('cohorts')
+    if not isinstance(cohorts, list) or not all(isinstance(cohort, dict) for cohort in cohorts):
+        abort(400, description='Expected JSON body with a list of "cohorts" (each a mapping of filters).')
+    if len(cohorts) > app.config.get('COMPARE_MAX_COHORTS', 5):
+        abort(400, description='Too many cohorts.')
+    arg_lists = tuple(tuple((str(key), str(val)) for key, val in cohort.items()) for cohort in cohorts)
+    try:
+        charts = get_compare_charts(arg_lists, current_generation(), get_jitter_week())
+    except ValueError as e:
+        abort(400, description=f'Invalid filter: {e}')
+    return jsonify({'cohorts': charts})
+
+
+@lru_cache(maxsize=64)
+def get_compare_charts(arg_lists, generation, week, jitter=True):
+    """Chart data for each filter set: each distinct filter (e.g., shared by all cohorts) is only
+    evaluated once, and all cohorts are aggregated together.
+    """
+    def jitter_and_mask_function(x, mask=0, label=''):
+        return jitter_and_mask(x, mask, label, jitter)
+
+    case_index = get_case_index()
+    filter_masks = {}
+    charts = [None] * len(arg_lists)
+    to_aggregate = []  # (cohort index, case mask)
+    for i, arg_list in enumerate(arg_lists):
+        mask = None
+        for arg in arg_list:
+            if arg not in filter_masks:
+                filter_masks[arg] = case_index.filter_mask(int(arg[0]), arg[1])
+            mask = filter_masks[arg] if mask is None else mask & filter_masks[arg]
+        selected = case_index.size if mask is None else int(np.count_nonzero(mask))
+        charts[i] = get_stored_chart(selected, mask is not None)
+        if charts[i] is None:
+            to_aggregate.append((i, mask))
+    if to_aggregate:
+        cells = get_chart_cells()
+        rows_list = [
+            cells.rows_for(np.ones(case_index.size, dtype=bool) if mask is None else mask)
+            for _, mask in to_aggregate
+        ]
+        mask_value = app.config.get('MASK', 0)
+        for (i, mask), aggregates in zip(to_aggregate, cells.aggregate_many(rows_list)):
+            no_results_flag = None if mask is None or mask.any() else True
+            charts[i] = format_chart(*render_chart(cells, aggregates, jitter_and_mask_function, mask_value),
+                                     no_results_flag, jitter_and_mask_function, mask_value)
+    return [chart_json(chart) for chart in charts]
+
+
+@app.route('/api/codebook', methods=['GET'])
+def get_codebook():
+    """Download every item/value with its (masked and jittered) number of subjects: `?format=csv|xlsx`
+    Any filters add a column with the number of selected subjects.
+    """
+    file_format = request.args.get('format', 'csv')
+    if file_format not in ('csv', 'xlsx'):
+        abort(400, description='Format must be one of: csv, xlsx')
+    arg_list = get_arg_list(exclude=('format',))
+    try:
+        mask = get_case_index().mask(arg_list)
+    except ValueError as e:
+        abort(400, description=f'Invalid filter: {e}')
+    mask_value = app.config.get('MASK', 0)
+
+    def count_function(count, item_id, value_id):  # same as facets
+        return jitter_and_mask(count, mask_value, f'facet-{item_id}-{value_id}') if count else 0
+
+    rows = iter_codebook_rows(get_catalog(), get_case_index(), count_function, mask)
+    if file_format == 'xlsx':
+        return send_file(write_xlsx(rows), as_attachment=True, download_name='codebook.xlsx',
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return Response(iter_csv(rows), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=codebook.csv'})
 
 
 @app.route('/api/dictionary/get', methods=['GET'])
 def api_get_dictionary():
+    return get_precompiled('dictionary', current_generation(), build_dictionary).to_response()
+
+
+def build_dictionary():
+    """Data dictionary entries grouped by category (only changes when `load_dd.py` is run)."""
     lst = []
     prev_variable = None
-    for de in models.DataEntry.query:
+    for de in db.session.query(
+            models.DataEntry.id, models.DataEntry.category, models.DataEntry.label,
+            models.DataEntry.variable, models.DataEntry.description, models.DataEntry.values,
+    ).order_by(models.DataEntry.id):
         if de.category != prev_variable:
             prev_variable = de.category
             lst.append({
@@ -258,25 +586,25 @@ def api_get_dictionary():
              'values': de.values or ''
              }
         )
-    return jsonify({
+    return PrecompiledResponse.from_json({
         'data_entries': lst
     })
 
 
 @lru_cache(maxsize=256)
-def api_filter_chart_helper(jitter=True, arg_list=None):
-    """
+def get_chart_data(jitter=True, arg_list=None):
+    """Chart for the filters as `ChartData`
+
     param: jitter: this is only set to False during pre-computing of default/starting filter
     """
 
     def jitter_and_mask_function(x, mask=0, label=''):
-        """
-        Apply jitter function unless:
-        * function is called with jitter=False (when precomputing)
-        * or, if config contains JITTER=None
-        """
-        return (masker(x, mask) if jitter is False or not app.config.get('JITTER', True)
-                else jitter_and_mask_value_by_date(x, mask, label))
+        return jitter_and_mask(x, mask, label, jitter)
+
+    if arg_list:
+        chart = get_precomputed_chart(arg_list, jitter_and_mask_function)
+        if chart is not None:
+            return chart
 
     # get set of cases
     cases, no_results_flag = parse_arg_list(arg_list or ())
@@ -293,99 +621,121 @@ def api_filter_chart_helper(jitter=True, arg_list=None):
     # get age counts for each sex
     age_buckets = [f'{age}-{age + age_step - 1}' for age in range(age_min, age_max - age_step, age_step)]
     age_buckets.append(f'{age_max - age_step}+')
-    sex_counts_bl, sex_data_bl, excl_case_bl = get_sex_by_age('age_bl', age_buckets, age_max, age_min, age_step, df,
-                                                jitter_and_mask_function, mask_value)
-    sex_counts_fu, sex_data_fu, excl_case_fu = get_sex_by_age('age_fu', age_buckets, age_max, age_min, age_step, df,
-                                    jitter_and_mask_function, mask_value)
+    series_bl, excl_case_bl = get_sex_by_age('age_bl', age_buckets, age_max, age_min, age_step, df,
+                                             jitter_and_mask_function, mask_value)
+    series_fu, excl_case_fu = get_sex_by_age('age_fu', age_buckets, age_max, age_min, age_step, df,
+                                             jitter_and_mask_function, mask_value)
 
-    enroll_data = []
     # censor same cases for enrollment based on whichever age has fewer excluded cases
     # select subject count based on baseline ages, and ensure same values are censored
-    selected_subjects_bl = sum(sum(x['data']) for x in sex_data_bl['datasets'])
-    selected_subjects_fu = sum(sum(x['data']) for x in sex_data_fu['datasets'])
+    selected_subjects_bl = int(series_bl[1].sum())
+    selected_subjects_fu = int(series_fu[1].sum())
     if selected_subjects_bl > selected_subjects_fu:  # more baseline cases (i.e., more fu cases excluded)
         age_var = 'age_bl'
         df = df.filter(~df['case'].is_in(excl_case_bl))
         selected_subjects = selected_subjects_bl
-        sex_counts = sex_counts_bl
+        sex_labels, sex_data = series_bl
     else:   # more fu cases (i.e., more bl cases excluded)
         age_var = 'age_fu'
         df = df.filter(~df['case'].is_in(excl_case_fu))
         selected_subjects = selected_subjects_fu
-        sex_counts = sex_counts_fu
+        sex_labels, sex_data = series_fu
+    sex_totals = list(zip(sex_labels, sex_data.sum(axis=1).tolist()))
 
-    for label, censored_hist_data, _ in censored_histogram_by_age_pl2(
+    enroll_counts = [
+        (label, sum(censored_hist_data))
+        for label, censored_hist_data, _ in censored_histogram_by_age_pl2(
             'enrollment', age_var, age_max, age_min, age_step, df,
-    ):
-        if not keep_enrollment(label):
-            continue
-        value = sum(censored_hist_data)
-        value = jitter_and_mask_function(value, mask_value, label)
-        # prepare the table row for display
-        enroll_data.append({
-            'id': f'enroll-{label}-count'.lower(),
-            'header': f'- {label} {get_update_date_text()}',
-            'value': value,
-        })
+        )
+    ]
+    return format_chart(age_buckets, series_bl, series_fu, sex_totals, enroll_counts, selected_subjects,
+                        df['followup_years'].mean(), no_results_flag, jitter_and_mask_function, mask_value)
+
+
+def get_stored_chart(selected, filtered=True):
+    """Chart stored at startup for an empty selection (`NULL_FILTER`) or the whole population
+    (`PRECOMPUTED_FILTER`), if applicable
+
+    :param selected: number of selected cases
+    :param filtered: False if there were no filters
+    """
+    if filtered and selected == 0 and app.config.get('NULL_FILTER', None):
+        return app.config['NULL_FILTER']
+    if app.config.get('PRECOMPUTED_FILTER', None) and (not filtered or selected >= app.config['POPULATION_SIZE']):
+        return app.config['PRECOMPUTED_FILTER']
+    return None
+
+
+def get_precomputed_chart(arg_list, jitter_function):
+    """Chart from the precomputed single filter or cube aggregates, without selecting cases
+    (None if the filters are not covered by these)
+    """
+    single_filters = get_precomputed_aggregates('SINGLE_FILTERS')
+    cube = get_precomputed_aggregates('CUBE')
+    looked_up = None
+    try:
+        if single_filters is not None and len(arg_list) == 1:
+            key, val = arg_list[0]
+            looked_up = single_filters.lookup(get_case_index(), int(key), val)
+        if looked_up is None and cube is not None:
+            looked_up = cube.lookup(get_case_index(), arg_list)
+    except ValueError:
+        return None  # let the full path report it
+    if looked_up is None:
+        return None
+    selected, aggregates = looked_up
+    chart = get_stored_chart(selected)
+    if chart is not None:
+        return chart
+    mask_value = app.config.get('MASK', 0)
+    return format_chart(*render_chart(get_chart_cells(), aggregates, jitter_function, mask_value),
+                        True if selected == 0 else None, jitter_function, mask_value)
+
+
+def format_chart(age_labels, series_bl, series_fu, sex_totals, enroll_counts, selected_subjects, followup_mean,
+                 no_results_flag, jitter_function, mask_value):
+    """Assemble table rows and charts as `ChartData`
 
+    :param series_bl, series_fu: (sex labels, jittered and masked counts by sex x age bin)
+    :param sex_totals: [(label, number of subjects (already jittered and masked)), ...]
+    :param enroll_counts: [(label, number of subjects (not yet jittered)), ...]
+    """
+    rows = []  # (id, header, value)
+    rows.append(('total-count',
+                 f'Total {app.config.get("COHORT_TITLE", "")} Population {get_update_date_text()}'.strip(),
+                 app.config['POPULATION_SIZE']))
     if selected_subjects > mask_value and not no_results_flag:
-        followup_years = round(df['followup_years'].mean(), 2)
+        followup_years = round(followup_mean, 2)
     else:
         selected_subjects = 0
         followup_years = 0
-
-    # table rows ('cohort subjects' table)
-    subject_counts = [
-                         {'id': f'total-count',
-                          'header': f'Total {app.config.get("COHORT_TITLE", "")} Population {get_update_date_text()}'.strip(),
-                          'value': app.config['POPULATION_SIZE']},
-                         {'id': f'selected-count',
-                          'header': 'Current Selection',
-                          'value': min(selected_subjects, app.config['POPULATION_SIZE'])},
-                     ] + enroll_data + sex_counts + [
-                         {'id': f'followup-years',
-                          'header': f'{app.config.get("COHORT_TITLE", "")} Follow-up {get_update_date_text()} (mean years)'.strip(),
-                          'value': followup_years}
-                     ]
-
-    # for google api: these are the charts
-    sex_data_bl_g = get_google_chart(sex_data_bl)
-    sex_data_fu_g = get_google_chart(sex_data_fu)
-    return subject_counts, sex_data_bl, sex_data_fu, sex_data_bl_g, sex_data_fu_g
-
-
-def get_google_chart(data):
-    new_data = []
-    new_labels = ['Age']
-    for label in data['labels']:
-        new_data.append([label])
-    for dataset in data['datasets']:
-        new_labels.append(dataset['label'])
-        for i, data_point in enumerate(dataset['data']):
-            new_data[i].append(data_point)
-    new_data.insert(0, new_labels)
-    return new_data
+    rows.append(('selected-count', 'Current Selection', min(selected_subjects, app.config['POPULATION_SIZE'])))
+    for label, value in enroll_counts:
+        if not keep_enrollment(label):
+            continue
+        rows.append((f'enroll-{label}-count'.lower(), f'- {label} {get_update_date_text()}',
+                     jitter_function(value, mask_value, label)))
+    for label, value in sex_totals:
+        rows.append((f'sex-{label}-count'.lower(), f'- {label}', value))
+    rows.append(('followup-years',
+                 f'{app.config.get("COHORT_TITLE", "")} Follow-up {get_update_date_text()} (mean years)'.strip(),
+                 followup_years))
+    row_ids, row_headers, row_values = (list(x) for x in zip(*rows))
+    return ChartData(row_ids, row_headers, row_values, list(age_labels), (series_bl, series_fu))
 
 
 def get_sex_by_age(age_var, age_buckets, age_max, age_min, age_step, df, jitter_function, mask_value):
-    sex_data = {'labels': age_buckets,  # show age range
-                'datasets': []}
-    sex_counts = []
+    """(sex labels, jittered and masked counts by sex x age bin) and the cases of masked bins"""
+    labels = []
+    data = []
     excluded_cases = []
     for label, censored_hist_data, new_excluded_cases in censored_histogram_by_age_pl2(
             'sex', age_var, age_max, age_min, age_step, df, jitter_function, mask_value,
     ):
         excluded_cases += new_excluded_cases
-        sex_data['datasets'].append({
-            'label': label,
-            'data': censored_hist_data,
-        })
-        sex_counts.append({
-            'id': f'sex-{label}-count'.lower(),
-            'header': f'- {label}',
-            'value': sum(censored_hist_data),  # already jittered and masked
-        })
-    return sex_counts, sex_data, excluded_cases
+        labels.append(label)
+        data.append(censored_hist_data)
+    return (labels, np.array(data, dtype=np.int64).reshape(len(labels), len(age_buckets))), excluded_cases
 
 
 def query_to_dict(rset):
@@ -404,9 +754,7 @@ def add_category(category_id):
     """Get information about a particular category.
 
     """
-    category = models.Category.query.filter_by(id=category_id).first()
-    res = get_range_from_category(category)
-    return jsonify(res)
+    return jsonify(get_range_from_category(category_id))
 
 
 def rounding(val, rounder, decimals=1, direction=1):
@@ -424,77 +772,12 @@ def rounding(val, rounder, decimals=1, direction=1):
     return res
 
 
-def chunker(iterable, chunk_size, fillvalue=None):
-    return zip_longest(*[iter(iterable)] * chunk_size, fillvalue=fillvalue)
-
-
-def get_range_from_category(category: models.Category):
-    return _get_range_from_category(category.id, category.name, category.description)
-
-
-@lru_cache(maxsize=256)
-def _get_range_from_category(category_id, category_name, category_description):
-    res = {
-        'items': [],
-        'id': category_id,
-        'name': category_name,
-        'description': category_description
-    }
-    for item in models.Item.query.filter_by(category=category_id):
-        if item.is_loaded:  # new way: precalculated values
-            values = None
-            item_range = None
-            if item.values:
-                value_ints = {int(x) for x in item.values.split('||')}
-                value_models = db.session.query(models.Value).filter(
-                    models.Value.id.in_(value_ints)
-                ).order_by(models.Value.order, models.Value.name)
-                values = sorted([
-                    {'id': v.id,
-                     'name': v.name,
-                     'description': v.description,
-                     'order': v.order if v.order is not None else 100
-                     } for v in value_models
-                ], key=lambda k: k['order'])
-            elif item.is_float:
-                item_range = [str(item.float_range_start), str(item.float_range_end), str(item.float_range_step)]
-            else:
-                item_range = [str(item.int_range_start), str(item.int_range_end), str(item.int_range_step)]
-            res['items'].append({
-                'name': item.name,
-                'id': item.id,
-                'description': item.description,
-                'values': values,
-                'range': item_range,
-            })
-        else:  # old way -- may be needed if not calculated
-            variables = set(
-                [x[0] for x in db.session.query(models.Variable.value).filter(models.Variable.item == item.id)])
-            values = []
-            ranges = set()
-            for vals in (
-                    db.session.query(models.Value).filter(models.Value.id.in_(var_set)).order_by(models.Value.order,
-                                                                                                 models.Value.name)
-                    for var_set in chunker(variables, 2000)):  # chunking for sql server max 2000 parameters
-                for v in vals:
-                    values.append(
-                        {'id': v.id,
-                         'name': v.name,
-                         'description': v.description,
-                         'order': v.order if v.order is not None else 100
-                         }
-                    )
-            values = sorted(values, key=lambda k: k['order'])
-
-            # record data
-            res['items'].append({
-                'name': item.name,
-                'id': item.id,
-                'description': item.description,
-                'values': None if ranges else values,
-                'range': [transform_decimal(x) for x in ranges] if ranges else None
-            })
-    return res
+def get_range_from_category(category_id):
+    """Category payload with each item's values or range, from the resident catalog."""
+    catalog = get_catalog()
+    if category_id not in catalog.categories:
+        abort(404)
+    return catalog.category_json(category_id)
 
 
 def transform_decimal(num):
@@ -515,12 +798,7 @@ def add_all_categories():
 def get_all_categories():
     if app.config.get('PRECOMPUTED_COLUMN', None):
         return app.config['PRECOMPUTED_COLUMN']
-    categories = []
-    for category in db.session.query(models.Category).order_by(models.Category.order).all():
-        cat = models.Category.query.filter_by(id=category.id).first()
-        res = get_range_from_category(cat)
-        categories.append(res)
-    return categories
+    return [get_range_from_category(category_id) for category_id in get_catalog().categories]
 
 
 def get_min_in_range(ranges, rstep):
@@ -548,7 +826,10 @@ def add_category_from_item(item_id):
     """Get category from item
 
     """
-    return add_category(models.Item.query.filter_by(id=item_id).first().category)
+    item = get_catalog().items.get(item_id, None)
+    if item is None:
+        abort(404)
+    return add_category(item.category_id)
 
 
 @app.route('/api/value/add/<int:value_id>', methods=['GET'])
@@ -556,8 +837,98 @@ def add_categories_from_value(value_id):
     """Get category from item
 
     """
-    val = models.Value.query.filter_by(id=value_id).first()
-    return add_category_from_item(models.Variable.query.filter_by(value=val.id).first().item)
+    item_id = get_catalog().item_of_value.get(value_id, None)
+    if item_id is None:
+        abort(404)
+    return add_category_from_item(item_id)
+
+
+@app.route('/api/category/batch', methods=['GET'])
+def add_category_batch():
+    """Get information about several categories: `?ids=1,2,3`
+    Items with many values only include the first page (see `get_item_values` for the rest).
+    """
+    category_ids = tuple(
+        int(category_id) for ids in request.args.getlist('ids') for category_id in ids.split(',')
+        if category_id.strip().isdigit()
+    )
+    return jsonify({'categories': _get_category_batch(category_ids)})
+
+
+@lru_cache(maxsize=256)
+def _get_category_batch(category_ids):
+    catalog = get_catalog()
+    page_size = app.config.get('VALUE_PAGE_SIZE', 50)
+    return [
+        catalog.category_json(category_id, value_limit=page_size)
+        for category_id in category_ids if category_id in catalog.categories
+    ]
+
+
+@app.route('/api/item/<int:item_id>/values', methods=['GET'])
+def get_item_values(item_id):
+    """Page through an item's values: `?offset=50&limit=50`"""
+    catalog = get_catalog()
+    if item_id not in catalog.items:
+        abort(404)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', app.config.get('VALUE_PAGE_SIZE', 50), type=int), 1), 1000)
+    total = len(catalog.items[item_id].value_ids)
+    return jsonify({
+        'itemId': item_id,
+        'values': catalog.item_values_json(item_id, offset, limit),
+        'offset': offset,
+        'limit': limit,
+        'total': total,
+        'next': f'/api/item/{item_id}/values?offset={offset + limit}&limit={limit}' if offset + limit < total else None,
+    })
+
+
+@app.route('/api/item/<int:item_id>/histogram', methods=['GET'])
+def get_item_histogram(item_id):
+    """Distribution of a numeric item's values for the current selection, binned on the slider's step"""
+    item = get_catalog().items.get(item_id, None)
+    if item is None or not item.range:
+        abort(404)
+    try:
+        histogram = get_item_histogram_data(item_id, get_arg_list(), current_generation(), get_jitter_week())
+    except ValueError as e:
+        abort(400, description=f'Invalid filter or range: {e}')
+    return jsonify(histogram)
+
+
+@lru_cache(maxsize=256)
+def get_item_histogram_data(item_id, arg_list, generation, week, jitter=True):
+    case_index = get_case_index()
+    edges = get_histogram_edges(*get_catalog().items[item_id].range)
+    counts = case_index.numeric_histogram(item_id, edges, case_index.mask(arg_list)).tolist()
+    mask_value = app.config.get('MASK', 0)
+    return {
+        'itemId': item_id,
+        'edges': edges.tolist(),
+        'counts': [  # bins without any selected subjects are not jittered
+            jitter_and_mask(count, mask_value, f'histogram-{item_id}-{i}', jitter) if count else 0
+            for i, count in enumerate(counts)
+        ],
+    }
+
+
+def get_histogram_edges(start, end, step):
+    """Bin edges from an item's range (strings as in `ItemRecord.range`), widening the step
+    if there would be more than `HISTOGRAM_MAX_BINS` bins.
+    """
+    start, end, step = float(start), float(end), float(step)
+    if step <= 0 or end < start:
+        raise ValueError(f'range ({start}, {end}, {step})')
+    n_bins = max(math.ceil((end - start) / step), 1)
+    max_bins = app.config.get('HISTOGRAM_MAX_BINS', 100)
+    if n_bins > max_bins:
+        step *= math.ceil(n_bins / max_bins)
+        n_bins = max(math.ceil((end - start) / step), 1)
+    edges = start + step * np.arange(n_bins + 1)
+    if start.is_integer() and step.is_integer():
+        return edges.astype(np.int64)
+    return edges
 
 
 @app.route('/api/user/check', methods=['GET'])
@@ -648,63 +1019,235 @@ def get_ip_address():
 @app.route('/api/tabs', methods=['GET'])
 def get_tabs():
     """Get headers and content for each page"""
+    return get_tabs_response().to_response()
+
+
+def get_tabs_response():
+    return get_precompiled('tabs', (current_generation(), get_stamp('tabs')), build_tabs)
+
+
+def build_tabs():
+    return PrecompiledResponse.from_json(get_tabs_data())
+
+
+def get_tabs_data():
     res = []
     curr = None
     c_header = None
-    for tab in db.session.query(models.TabData).order_by(
+    for header, text_type, content in db.session.query(
+            models.TabData.header, models.TabData.text_type, models.TabData.text,
+    ).order_by(
             models.TabData.order, models.TabData.header, models.TabData.line
     ):
-        if tab.header != c_header:
-            c_header = tab.header
+        if header != c_header:
+            c_header = header
             if curr:
                 res.append(curr)
             curr = {
-                'header': tab.header,
-                'lines': [{'type': tab.text_type, 'text': tab.text}]
+                'header': header,
+                'lines': [{'type': text_type, 'text': content}]
             }
         else:
-            curr['lines'].append({'type': tab.text_type, 'text': tab.text})
+            curr['lines'].append({'type': text_type, 'text': content})
     res.append(curr)  # fencepost
-    return jsonify({'tabs': res})
+    return {'tabs': res}
 
 
 @app.route('/api/comments/<string:component>', methods=['GET'])
 def get_comments(component):
     """Get data concerning comments on main page"""
-    comments = []
-    for c in db.session.query(
-            models.Comment
-    ).filter(
-        models.Comment.location == component
+    compiled = get_comments_responses()
+    return compiled.get(component, compiled[None]).to_response()
+
+
+def get_comments_responses():
+    """Compiled comments for each location (`None` for locations without comments)"""
+    return get_precompiled('comments', (current_generation(), get_stamp('comments')), build_comments)
+
+
+def build_comments():
+    comments = get_comments_by_location()
+    return {
+        location: PrecompiledResponse.from_json(get_comments_data(comments.get(location, [])))
+        for location in [None] + list(comments)
+    }
+
+
+def get_comments_by_location():
+    comments = defaultdict(list)
+    for location, comment in db.session.query(
+            models.Comment.location, models.Comment.comment,
     ).order_by(
         models.Comment.location,
         models.Comment.line
     ):
-        comments.append(c.comment)
-    return jsonify({
+        comments[location].append(comment)
+    return comments
+
+
+def get_comments_data(comments):
+    return {
         'comments': comments,
         'mask': app.config['MASK'],
         'cohortTitle': app.config.get('COHORT_TITLE', '')
-    })
+    }
 
 
 @app.route('/api/data/dictionary/get', methods=['GET'])
 def get_data_dictionary():
-    """Get excel file as a download"""
-    df = models.DataFile.query.order_by(text('-id')).first()
-    return send_file(BytesIO(df.file),
+    """Get excel file as a download (supports Range and If-None-Match)"""
+    data_file = get_data_dictionary_meta_info(current_generation())
+    if data_file is None:
+        abort(404)
+    _, filename, md5_checksum = data_file
+    return send_file(get_data_dictionary_path(current_generation()),
                      mimetype='application/vnd.ms-excel',
-                     download_name=df.filename,
-                     as_attachment=True)
+                     download_name=filename,
+                     as_attachment=True,
+                     conditional=True,
+                     etag=md5_checksum)
+
+
+@lru_cache(maxsize=1)
+def get_data_dictionary_meta_info(generation):
+    """(id, filename, md5_checksum) of the most recent data dictionary file, or None"""
+    df = db.session.query(
+        models.DataFile.id, models.DataFile.filename, models.DataFile.md5_checksum,
+    ).order_by(models.DataFile.id.desc()).first()
+    if df is None:
+        return None
+    md5_checksum = df.md5_checksum
+    if not md5_checksum:  # not recorded by loader: compute once
+        md5_checksum = hashlib.md5(_get_data_file_blob(df.id)).hexdigest()
+    return df.id, df.filename, md5_checksum
+
+
+def _get_data_file_blob(data_file_id):
+    return db.session.query(models.DataFile.file).filter(models.DataFile.id == data_file_id).scalar()
+
+
+@lru_cache(maxsize=1)
+def get_data_dictionary_path(generation):
+    """Write data dictionary file once to `BASE_DIR/data_dictionary/<md5>.<ext>` so it can be sent from disk."""
+    data_file_id, filename, md5_checksum = get_data_dictionary_meta_info(generation)
+    directory = os.path.join(app.config['BASE_DIR'], 'data_dictionary')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{md5_checksum}{os.path.splitext(filename or "")[1]}')
+    if not os.path.exists(path):  # content-addressed: an existing file is already correct
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fh:
+            fh.write(_get_data_file_blob(data_file_id))
+        os.replace(tmp_path, path)
+        app.logger.info(f'Wrote data dictionary file: {path}')
+    return path
 
 
 @app.route('/api/data/dictionary/meta', methods=['GET'])
 def get_data_dictionary_meta():
     """Get checksums"""
-    df = models.DataFile.query.order_by(text('-id')).first()
-    return jsonify({
+    return jsonify(get_data_dictionary_meta_data())
+
+
+def get_data_dictionary_meta_data():
+    data_file = get_data_dictionary_meta_info(current_generation())
+    return {
         'checksums': [{
             'type': 'md5',
-            'value': 'Unavailable' if df is None else df.md5_checksum,
+            'value': 'Unavailable' if data_file is None else data_file[2],
         }]
+    }
+
+
+@app.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Everything needed for the first page load in one response:
+        /api/tabs, /api/comments/table, /api/category/all, /api/filter/chart (no filters),
+        and /api/data/dictionary/meta
+    """
+    return get_bootstrap_response().to_response()
+
+
+def get_bootstrap_response():
+    key = (current_generation(), get_jitter_week(), get_stamp('tabs'), get_stamp('comments'))
+    return get_precompiled('bootstrap', key, build_bootstrap)
+
+
+def build_bootstrap():
+    return PrecompiledResponse.from_json({
+        'tabs': get_tabs_data(),
+        'comments': get_comments_data(get_comments_by_location().get('table', [])),
+        'categories': {'categories': get_all_categories()},
+        'chart': get_filter_chart_data(()),
+        'dictionaryMeta': get_data_dictionary_meta_data(),
     })
+
+
+# read-only endpoints which may be requested through `/api/batch`
+BATCH_ENDPOINTS = {
+    'search', 'search_metrics', 'api_filter_export', 'api_filter_chart', 'api_filter_count',
+    'api_filter_facets', 'api_get_dictionary', 'add_category', 'add_all_categories',
+    'add_category_from_item', 'add_categories_from_value', 'add_category_batch', 'get_item_values',
+    'get_item_histogram', 'api_filter_crosstab', 'get_tabs', 'get_comments', 'get_data_dictionary_meta',
+    'get_bootstrap',
+}
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Run several read-only sub-requests in one call. Expects JSON:
+        {"requests": [{"id": "chart", "path": "/api/filter/chart?12=34"}, "/api/category/add/1", ...]}
+
+    Independent sub-requests are run in parallel (`BATCH_WORKERS`, default 4) and
+    share the process-wide caches. Results are returned in request order:
+        {"responses": [{"id": "chart", "path": ..., "status": 200, "body": ...}, ...]}
+    JSON bodies are included as JSON and text as a string; any other body (e.g., `format=msgpack`)
+    is base64-encoded and marked with "encoding": "base64".
+    """
+    data = request.get_json(silent=True) or {}
+    sub_requests = data.get('requests')
+    if not isinstance(sub_requests, list):
+        abort(400, description='Expected JSON body with a list of "requests".')
+    if len(sub_requests) > app.config.get('BATCH_MAX_REQUESTS', 20):
+        abort(400, description='Too many requests in batch.')
+    sub_requests = [
+        {'id': sub_request.get('id', i), 'path': sub_request.get('path')} if isinstance(sub_request, dict)
+        else {'id': i, 'path': sub_request}
+        for i, sub_request in enumerate(sub_requests)
+    ]
+    if any(not isinstance(sub_request['path'], str) for sub_request in sub_requests):
+        abort(400, description='Each request requires a "path".')
+    app.logger.info(f'Batch of {len(sub_requests)}: {[x["path"] for x in sub_requests]}')
+    if len(sub_requests) <= 1:
+        responses = [_run_batch_request(sub_request, request.host_url) for sub_request in sub_requests]
+    else:
+        base_urls = [request.host_url] * len(sub_requests)
+        with ThreadPoolExecutor(max_workers=min(app.config.get('BATCH_WORKERS', 4), len(sub_requests))) as pool:
+            responses = list(pool.map(_run_batch_request, sub_requests, base_urls))
+    return jsonify({'responses': responses})
+
+
+def _run_batch_request(sub_request, base_url):
+    """Dispatch a single sub-request in its own request context (and, so, DB session)."""
+    result = {'id': sub_request['id'], 'path': sub_request['path']}
+    with app.test_request_context(sub_request['path'], method='GET', base_url=base_url):
+        if request.url_rule is None or request.url_rule.endpoint not in BATCH_ENDPOINTS:
+            result.update(status=404, body=None)
+            return result
+        try:
+            response = app.full_dispatch_request()
+            body = b''.join(response.iter_encoded())
+            if response.is_json:
+                body = json.loads(body)
+            elif response.mimetype.startswith('text/'):
+                body = body.decode(response.mimetype_params.get('charset', 'utf8'))
+            else:  # binary (e.g., MessagePack)
+                body = base64.b64encode(body).decode('ascii')
+                result['encoding'] = 'base64'
+        except Exception as e:
+            app.logger.exception(f'Batch request failed: {sub_request["path"]}: {e}')
+            result.pop('encoding', None)
+            result.update(status=500, body=None)
+            return result
+        result['status'] = response.status_code
+        result['body'] = body
+    return result
@@ -19,7 +19,10 @@ def read_mapping(mapping):
         return result
     return mapping
 
-def save_data_model(graph_data, *, enrollment_mapping=None, gender_mapping=None):
+def save_data_model(graph_data, *, enrollment_mapping=None, gender_mapping=None, dimensions=None):
+    """
+    :param dimensions: names of additional dimensions (from `DATA_MODEL_DIMENSIONS`) in `graph_data`
+    """
     logger.info(f'Saving graph data.')
     enrollment_mapping = read_mapping(enrollment_mapping)
     gender_mapping = read_mapping(gender_mapping)
@@ -36,4 +39,23 @@ def save_data_model(graph_data, *, enrollment_mapping=None, gender_mapping=None)
         )
     db.session.bulk_save_objects(dms)
     db.session.commit()
+    for dimension in dimensions or ():
+        save_dimension(graph_data, dimension)
     logger.info(f'Finished saving graph data.')
+
+
+def save_dimension(graph_data, dimension):
+    """Store an additional dimension dictionary-encoded: labels once, a small integer per case"""
+    logger.info(f'Saving dimension: {dimension}.')
+    labels = sorted({data[dimension] for data in graph_data.values() if data.get(dimension) is not None})
+    codes = {label: code for code, label in enumerate(labels)}
+    db.session.query(models.DimensionLabel).filter_by(dimension=dimension).delete()
+    db.session.query(models.CaseDimension).filter_by(dimension=dimension).delete()
+    db.session.bulk_save_objects([
+        models.DimensionLabel(dimension=dimension, code=code, label=label) for label, code in codes.items()
+    ])
+    db.session.bulk_save_objects([
+        models.CaseDimension(case=case, dimension=dimension, code=codes[data[dimension]])
+        for case, data in graph_data.items() if data.get(dimension) is not None
+    ])
+    db.session.commit()
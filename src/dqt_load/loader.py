@@ -17,10 +17,11 @@ from dqt_load.values import add_values
 def parse_csv(fp, datamodel_vars,
               items_from_data_dictionary_only, target_columns=None,
               skip_rounding: set[str] = None, age_min=None, age_max=None, age_step=None,
-              enrollment_mapping=None, gender_mapping=None):
+              enrollment_mapping=None, gender_mapping=None, dimensions=None):
     """
     Load csv file into database, committing after each case.
     :param datamodel_vars:
+    :param dimensions: names of additional data model dimensions (values of `datamodel_vars`)
     :param items_from_data_dictionary_only:
     :param fp: path to csv file
     :param skip_rounding: set of columns names (i.e., variable names)
@@ -44,7 +45,8 @@ def parse_csv(fp, datamodel_vars,
     col_number = 0
     for col in datamodel_cols + [sentinel] + columns:
         if col == sentinel:
-            save_data_model(graph_data, enrollment_mapping=enrollment_mapping, gender_mapping=gender_mapping)
+            save_data_model(graph_data, enrollment_mapping=enrollment_mapping, gender_mapping=gender_mapping,
+                            dimensions=dimensions)
             graph_data = None
             continue
         col_number += 1
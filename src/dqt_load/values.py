@@ -1,6 +1,9 @@
+from collections import defaultdict
+
 from loguru import logger
 
 from dqt_api import models, db
+from dqt_api.catalog import value_display_key
 from dqt_api.views import rounding
 from dqt_load.globals import VALUES_BY_ITEM, VALUES, ITEMS
 from dqt_load.ranges import get_ranges
@@ -19,6 +22,8 @@ def add_values(cdf, col, item, lookup_col=None, graph_data=None, datamodel_vars:
     if lookup_col is None or lookup_col not in cdf.columns:
         lookup_col = None  # no lookup column
     unique_values = set()  # collect all unique values
+    value_cases = defaultdict(set)  # value id -> cases (several raw values may share a value)
+    value_models = {}  # value id -> value model
     is_valid_range = True  # check to see if the values could be part of a range
     filter_clause = [col, lookup_col] if lookup_col is not None else [col]
     for row in cdf[filter_clause].drop_duplicates().itertuples():
@@ -76,6 +81,7 @@ def add_values(cdf, col, item, lookup_col=None, graph_data=None, datamodel_vars:
         #  - we may get multiple due to rounding (e.g., 0.53, 0.54 -> 0.5)
         #  - rounded values should get same id
         unique_values.add((value_model.name_typed, value_model.order, value_model.id))
+        value_models[value_model.id] = value_model
 
         # add 'variable': i.e., individual-level data which connects an item and its value
         variables = []
@@ -83,7 +89,9 @@ def add_values(cdf, col, item, lookup_col=None, graph_data=None, datamodel_vars:
             mask = cdf[lookup_col] == lookup_value
         else:
             mask = cdf[col] == original_value
-        for case in cdf[mask].index:
+        cases = cdf[mask].index
+        value_cases[value_model.id].update(cases)
+        for case in cases:
             # NOTE: I'm not sure the `cdf[col] == original_value` is adding anything, but requires
             #       tracking an additional value (`original_value`: what value was before possible conversion)
             if item in ITEMS:  # ensure this is in data dictionary
@@ -117,9 +125,13 @@ def add_values(cdf, col, item, lookup_col=None, graph_data=None, datamodel_vars:
             item_model.is_loaded = True
             if rounded:
                 item_model.rounded = rounded
-        else:  # list of (name, order, value.id)
-            values = '||'.join(str(x[2]) for x in sorted(unique_values, key=lambda x: x[1]))  # sort by order
-            if len(values) < 500:  # field limit of 500 characters
-                item_model.values = values
-                item_model.is_loaded = True
+        else:  # values in display order (as sorted by the catalog)
+            db.session.query(models.ItemValue).filter_by(item=item_model.id).delete()
+            db.session.bulk_save_objects([
+                models.ItemValue(item=item_model.id, value=value.id, order=i, count=len(value_cases[value.id]))
+                for i, value in enumerate(
+                    sorted(value_models.values(), key=lambda v: value_display_key(v.order, v.name))
+                )
+            ])
+            item_model.is_loaded = True
     db.session.commit()
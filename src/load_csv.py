@@ -16,6 +16,7 @@ from loguru import logger
 from dqt_api import app, db
 from dqt_api import models
 from dqt_api.__main__ import prepare_config
+from dqt_api.catalog import save_category_payloads
 from dqt_api.manage import add_tabs, add_comments, create_with_context, create_user_data_with_context
 
 from dqt_load.categories import unpack_domains
@@ -51,6 +52,11 @@ def main():
             args.enrollment: 'enrollment',
             args.followup_years: 'followup_years'
         }
+        # additional dimensions for the graphs/tables: {dimension name: csv column}
+        dimensions = app.config.get('DATA_MODEL_DIMENSIONS', None) or {}
+        if reserved := set(dimensions) & (set(datamodel_vars.values()) | {'sex', 'case'}):
+            raise ValueError(f'DATA_MODEL_DIMENSIONS cannot use built-in names: {sorted(reserved)}')
+        datamodel_vars.update({column.lower(): dimension for dimension, column in dimensions.items()})
         target_columns = None
         if args.target_columns:
             target_columns = list(datamodel_vars.keys()) + args.target_columns
@@ -69,7 +75,10 @@ def main():
                   age_step=app.config.get('AGE_STEP', None),
                   skip_rounding=set(args.skip_rounding) | {args.followup_years},
                   enrollment_mapping=args.enrollment_mapping,
-                  gender_mapping=args.gender_mapping)
+                  gender_mapping=args.gender_mapping,
+                  dimensions=list(dimensions))
+        logger.debug('Materializing category payloads.')
+        save_category_payloads()
 
         if args.dd_input_file:
             # optionally generate and store the data dictionary
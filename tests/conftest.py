@@ -0,0 +1,143 @@
+"""
+Small SQLite database with the tables written by the loader, and the app initialized from it
+(one app per session: extensions can only be registered once).
+
+    - Demographics: sex (1 female, 2 male), race (3-5; stored order differs from names)
+    - Diagnoses: diagnosis (6-8; some cases have two), casi (integer range), bmi (float range)
+    - smoker (9-10): no `ItemValue` rows, so values come from `Variable`
+"""
+import numpy as np
+import pytest
+
+from dqt_api import app as flask_app, db, models, views, whooshee
+from dqt_api.__main__ import prepare_config
+from dqt_api.load_globals import initialize
+
+N_CASES = 300
+MASK = 5
+AGE_MIN, AGE_MAX, AGE_STEP = 60, 100, 10
+CATEGORICAL_VALUES = {  # item id -> [(value id, name, order)]
+    1: [(1, 'female', 0), (2, 'male', 1)],
+    2: [(3, 'white', 2), (4, 'black', 1), (5, 'asian', None)],
+    3: [(6, 'dementia', 0), (7, 'stroke', 1), (8, 'none', 2)],
+    6: [(9, 'yes', None), (10, 'no', None)],
+}
+NUMERIC_ITEMS = {4: 'casi', 5: 'bmi'}
+
+
+def build_rows(seed=0):
+    """Model instances for the fixture database"""
+    rng = np.random.default_rng(seed)
+    rows = [
+        models.Category(id=1, name='Demographics', description='Who', order=1),
+        models.Category(id=2, name='Diagnoses', description='What', order=2),
+        models.Item(id=1, name='Sex', varname='sex', category=1, is_loaded=True),
+        models.Item(id=2, name='Race', varname='race', category=1, is_loaded=True),
+        models.Item(id=3, name='Diagnosis', varname='dx', category=2, is_loaded=True),
+        models.Item(id=4, name='CASI', varname='casi', category=2, is_loaded=True, is_float=False,
+                    int_range_start=60, int_range_end=100, int_range_step=1),
+        models.Item(id=5, name='BMI', varname='bmi', category=2, is_loaded=True, is_float=True,
+                    float_range_start=18.0, float_range_end=35.0, float_range_step=0.5),
+        models.Item(id=6, name='Smoker', varname='smoker', category=1, is_loaded=False),
+    ]
+    for item_id, values in CATEGORICAL_VALUES.items():
+        for value_id, name, order in values:
+            rows.append(models.Value(name, order=order))
+            rows[-1].id = value_id
+            if item_id != 6:
+                rows.append(models.ItemValue(item=item_id, value=value_id, order=order))
+    numeric_values = {}  # (item id, number) -> value id
+    for i, number in enumerate(range(60, 101)):
+        numeric_values[4, number] = 100 + i
+    for i, number in enumerate(np.arange(18.0, 35.5, 0.5).tolist()):
+        numeric_values[5, number] = 200 + i
+    for (item_id, number), value_id in numeric_values.items():
+        rows.append(models.Value(str(number)))
+        rows[-1].id = value_id
+
+    for case in range(1, N_CASES + 1):
+        sex = int(rng.integers(1, 3))
+        age_bl = int(rng.integers(55, 96))
+        followup = None if rng.random() < 0.1 else int(rng.integers(0, 16))
+        rows.append(models.DataModel(
+            case=case,
+            age_bl=None if rng.random() < 0.03 else age_bl,
+            age_fu=age_bl + (followup or 0),
+            sex=('female', 'male')[sex - 1],
+            enrollment=str(rng.choice(['active', 'inactive', 'deceased'])),
+            followup_years=followup,
+        ))
+        if case % 61:  # a few cases without the sex item
+            rows.append(models.Variable(case=case, item=1, value=sex))
+        rows.append(models.Variable(case=case, item=2, value=int(rng.choice([3, 3, 3, 4, 5]))))
+        for value_id in rng.choice([6, 7, 8], size=int(rng.integers(0, 3)), replace=False).tolist():
+            rows.append(models.Variable(case=case, item=3, value=value_id))
+        if rng.random() < 0.9:
+            rows.append(models.Variable(case=case, item=4, value=numeric_values[4, int(rng.integers(60, 101))]))
+        if rng.random() < 0.8:
+            bmi = float(rng.choice(np.arange(18.0, 35.5, 0.5)))
+            rows.append(models.Variable(case=case, item=5, value=numeric_values[5, bmi]))
+        if rng.random() < 0.5:
+            rows.append(models.Variable(case=case, item=6, value=int(rng.choice([9, 10]))))
+    rows.append(models.Variable(case=1, item=2, value=3))  # duplicate row
+    rows.append(models.DataModel(case=N_CASES + 1, age_bl=70, age_fu=75, sex='female', followup_years=5))
+    rows += [
+        models.TabData(header='About', line=1, text_type='text', text='About the cohort.', order=1),
+        models.Comment(location='table', line=1, comment='Counts are jittered.'),
+    ]
+    return rows
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    base_dir = tmp_path_factory.mktemp('dqt')
+    flask_app.config.update(
+        BASE_DIR=str(base_dir),
+        SECRET_KEY=b'test' * 4,
+        LOG_KEY=b'k' * 32,
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{base_dir / "test.db"}',
+        AGE_MIN=AGE_MIN,
+        AGE_MAX=AGE_MAX,
+        AGE_STEP=AGE_STEP,
+        MASK=MASK,
+        JITTER='test',
+        ORIGINS=['*'],
+        COHORT_TITLE='Test',
+        TESTING=True,
+    )
+    prepare_config(whooshee_dir=True, skip_init=True)
+    with flask_app.app_context():
+        db.create_all()
+        db.session.add_all(build_rows())
+        db.session.commit()
+        whooshee.reindex()
+        initialize(flask_app, db)
+    yield flask_app
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture()
+def app_context(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture()
+def chart_cache():
+    """Clear the chart caches before and after a test which changes how charts are computed"""
+    views.get_chart_data.cache_clear()
+    yield views.get_chart_data
+    views.get_chart_data.cache_clear()
+
+
+def assert_same_chart(chart, expected):
+    assert chart.row_ids == expected.row_ids
+    assert chart.row_values == expected.row_values
+    assert chart.age_labels == expected.age_labels
+    for (labels, counts), (expected_labels, expected_counts) in zip(chart.series, expected.series):
+        assert labels == expected_labels
+        np.testing.assert_array_equal(counts, expected_counts)
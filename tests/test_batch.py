@@ -0,0 +1,88 @@
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+from flask import Response
+
+from dqt_api import chart_format, views
+
+PATHS = [
+    '/api/filter/chart?1=2',
+    '/api/filter/count?1=2&4=70~90',
+    '/api/filter/facets?2=3',
+    '/api/category/add/1',
+    '/api/item/4/histogram',
+    '/api/tabs',
+]
+
+
+def test_batch_matches_requests(client):
+    requests = [{'id': 'chart', 'path': PATHS[0]}] + PATHS[1:]
+    response = client.post('/api/batch', json={'requests': requests})
+    assert response.status_code == 200
+    responses = response.json['responses']
+    assert [x['id'] for x in responses] == ['chart', 1, 2, 3, 4, 5]
+    for path, result in zip(PATHS, responses):
+        expected = client.get(path)
+        assert result['path'] == path
+        assert result['status'] == 200
+        assert result['body'] == expected.json
+
+
+def test_batch_sub_request_errors(client):
+    paths = [
+        '/api/filter/count?4=x~',  # invalid filter
+        '/api/category/add/99',  # not found
+        '/api/user/check',  # not allowed in a batch
+        '/api/filter/compare',  # POST only
+        '/api/nothing',
+    ]
+    responses = client.post('/api/batch', json={'requests': paths}).json['responses']
+    assert [x['status'] for x in responses] == [400, 404, 404, 404, 404]
+
+
+def test_batch_sub_request_exception(app, client, monkeypatch):
+    def fail():
+        raise RuntimeError('fail')
+    monkeypatch.setitem(app.view_functions, 'get_tabs', fail)
+    responses = client.post('/api/batch', json={'requests': ['/api/tabs']}).json['responses']
+    assert responses == [{'id': 0, 'path': '/api/tabs', 'status': 500, 'body': None}]
+
+
+def test_batch_binary_body(client, monkeypatch):
+    def packb(data, use_bin_type=True):
+        return b'\x81\xa4data' + json.dumps(data).encode('utf8')  # a map header is not valid UTF-8
+    monkeypatch.setattr(chart_format, 'msgpack', SimpleNamespace(packb=packb))
+    views.get_filter_chart_compact.cache_clear()
+    try:
+        paths = ['/api/filter/chart?1=2&format=msgpack', '/api/search?query=ab']
+        responses = client.post('/api/batch', json={'requests': paths}).json['responses']
+        assert responses[0]['status'] == 200 and responses[0]['encoding'] == 'base64'
+        assert base64.b64decode(responses[0]['body']) == client.get(paths[0]).get_data()
+        assert 'encoding' not in responses[1]
+        assert responses[1]['body'] == client.get(paths[1]).get_data(as_text=True)
+    finally:
+        views.get_filter_chart_compact.cache_clear()
+
+
+def test_batch_body_exception(app, client, monkeypatch):
+    def body():
+        yield b'{'
+        raise RuntimeError('fail')
+    monkeypatch.setitem(app.view_functions, 'get_tabs', lambda: Response(body(), mimetype='application/json'))
+    responses = client.post('/api/batch', json={'requests': ['/api/tabs', '/api/item/4/histogram']}).json['responses']
+    assert responses[0] == {'id': 0, 'path': '/api/tabs', 'status': 500, 'body': None}
+    assert responses[1]['status'] == 200
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {},
+    {'requests': '/api/tabs'},
+    {'requests': [{'id': 'x'}]},
+    {'requests': [1]},
+    {'requests': ['/api/tabs'] * 21},  # more than `BATCH_MAX_REQUESTS`
+])
+def test_batch_bad_input(client, body):
+    assert client.post('/api/batch', json=body).status_code == 400
@@ -0,0 +1,15 @@
+
+def test_bootstrap_matches_endpoints(client):
+    response = client.get('/api/bootstrap')
+    assert response.status_code == 200
+    data = response.json
+    assert data['tabs'] == client.get('/api/tabs').json
+    assert data['comments'] == client.get('/api/comments/table').json
+    assert data['categories'] == client.get('/api/category/all').json
+    assert data['chart'] == client.get('/api/filter/chart').json
+    assert data['dictionaryMeta'] == client.get('/api/data/dictionary/meta').json
+    assert client.get('/api/bootstrap', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_bootstrap_ignores_filters(client):
+    assert client.get('/api/bootstrap?1=2').get_data() == client.get('/api/bootstrap').get_data()
@@ -0,0 +1,131 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from dqt_api import case_index as ci_module, db, models, views
+
+ARG_LISTS = [
+    (),
+    (('1', '1'),),
+    (('2', '3_4'),),
+    (('3', '6'), ('3', '7')),
+    (('3', '6_7_8'),),
+    (('4', '70~80'),),
+    (('4', '~65'),),
+    (('4', '90~'),),
+    (('4', '~'),),
+    (('5', '20.5~25'),),
+    (('1', '1~2'),),  # not numeric
+    (('1', '2'), ('4', '70~90'), ('2', '5')),
+    (('1', '1'), ('1', '2')),  # no results
+    (('2', '999'),),
+    (('99', '1'),),
+    (('6', '9'),),
+]
+
+
+def cases_from_database(arg_list):
+    """The filters as database queries (the way they were evaluated before the case index)"""
+    cases = None
+    for key, val in arg_list:
+        query = db.session.query(models.Variable.case).filter(models.Variable.item == int(key))
+        if '~' in val:
+            low, high = val.split('~')[:2]
+            query = query.join(models.Value)
+            if low:
+                query = query.filter(models.Value.name_numeric >= float(low))
+            if high:
+                query = query.filter(models.Value.name_numeric <= float(high))
+        else:
+            query = query.filter(models.Variable.value.in_([int(v) for v in val.split('_')]))
+        found = {case for case, in query}
+        cases = found if cases is None else cases & found
+    if cases is None:
+        return sorted({case for case, in db.session.query(models.Variable.case)}), False
+    return (sorted(cases), None) if cases else (None, True)
+
+
+@pytest.mark.parametrize('arg_list', ARG_LISTS)
+def test_parse_arg_list_matches_database(app_context, arg_list):
+    cases, no_results_flag = views.parse_arg_list.__wrapped__(arg_list)
+    expected_cases, expected_flag = cases_from_database(arg_list)
+    assert no_results_flag is expected_flag
+    if expected_cases is None:
+        assert cases is None
+    else:
+        np.testing.assert_array_equal(cases, expected_cases)
+
+
+@pytest.mark.parametrize('arg_list', [(('1', 'a'),), (('1', '1_a'),), (('x', '1'),), (('4', 'x~'),)])
+def test_parse_arg_list_invalid(app_context, arg_list):
+    with pytest.raises(ValueError):
+        views.parse_arg_list.__wrapped__(arg_list)
+
+
+@pytest.mark.parametrize('arg_list', ARG_LISTS)
+def test_mask_matches_positions(app_context, arg_list):
+    case_index = views.get_case_index()
+    mask = case_index.mask(arg_list)
+    positions = case_index.positions(arg_list)
+    if not arg_list:
+        assert mask is None and positions is None
+    else:
+        np.testing.assert_array_equal(np.flatnonzero(mask), positions)
+
+
+def test_invalid_value_raises(app_context):
+    case_index = views.get_case_index()
+    with pytest.raises(ValueError):
+        case_index.positions((('4', 'abc~'),))
+    with pytest.raises(ValueError):
+        case_index.positions((('1', 'x'),))
+
+
+def test_index_contents(app_context):
+    case_index = views.get_case_index()
+    assert case_index.size == 300  # only cases in `Variable`
+    lo, hi = case_index.item_pairs(2)
+    assert case_index.pair_value[lo:hi].tolist() == [3, 4, 5]
+    assert np.all(np.isnan(case_index.pair_numeric[lo:hi]))
+    lo, hi = case_index.item_pairs(4)
+    assert np.all(case_index.pair_numeric[lo:hi] >= 60)
+    counts = case_index.value_counts([1])[1]
+    assert sum(counts.values()) == 300 - len(range(61, 301, 61))
+
+
+def test_intersect_sorted():
+    a = np.array([1, 3, 5, 7, 9])
+    b = np.array([2, 3, 4, 9, 10, 11])
+    assert ci_module.intersect_sorted(a, b).tolist() == [3, 9]
+    assert ci_module.intersect_sorted(b, a).tolist() == [3, 9]
+    assert ci_module.intersect_sorted(a, np.array([], dtype=int)).tolist() == []
+
+
+@pytest.mark.parametrize('fetch_size', [7, 100_000])
+def test_index_file_matches_index(app_context, tmp_path, monkeypatch, fetch_size):
+    monkeypatch.setattr(ci_module, 'FETCH_SIZE', fetch_size)
+    expected = ci_module.build_case_index(generation='g')
+    path = str(tmp_path / 'case_index.bin')
+    ci_module.build_case_index_file(path, generation='g')
+    mapped = ci_module.open_case_index(path)
+    assert mapped.generation == 'g'
+    for name in ci_module.INDEX_ARRAYS:
+        np.testing.assert_array_equal(getattr(mapped, name), getattr(expected, name))
+    arg_list = (('1', '2'), ('4', '70~90'))
+    np.testing.assert_array_equal(mapped.positions(arg_list), expected.positions(arg_list))
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not an index')
+    with pytest.raises(ValueError):
+        ci_module.open_case_index(str(path))
+
+
+def test_mapped_index_pickles_as_path(app_context, tmp_path):
+    path = str(tmp_path / 'case_index.bin')
+    ci_module.build_case_index_file(path, generation='g')
+    mapped = pickle.loads(pickle.dumps(ci_module.open_case_index(path)))
+    assert mapped.path == path
+    assert isinstance(mapped.case_pos, np.memmap) or isinstance(mapped.case_pos.base, np.memmap)
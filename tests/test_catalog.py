@@ -0,0 +1,97 @@
+import pytest
+import sqlalchemy
+
+from dqt_api import catalog, db, models
+from dqt_api.catalog import build_catalog, load_item_values, value_display_key
+
+
+def test_values_in_stored_order(app_context):
+    result = build_catalog(use_payloads=False)
+    assert result.items[2].value_ids == (5, 4, 3)  # ItemValue.order (None first), not by name
+    assert result.items[1].value_ids == (1, 2)
+
+
+def test_stored_order_is_source_of_truth(app_context):
+    db.session.query(models.ItemValue).filter_by(item=1, value=1).update({'order': 5})
+    try:
+        assert load_item_values()[1] == [2, 1]
+        assert build_catalog(use_payloads=False).items[1].value_ids == (2, 1)
+    finally:
+        db.session.rollback()
+
+
+def test_values_without_item_value_rows(app_context):
+    result = build_catalog(use_payloads=False)
+    values = result.values
+    expected = sorted((9, 10), key=lambda v: value_display_key(values[v].order, values[v].name))
+    assert result.items[6].value_ids == tuple(expected) == (10, 9)  # from `Variable`, by name
+
+
+def test_numeric_items_have_ranges(app_context):
+    result = build_catalog(use_payloads=False)
+    assert result.items[4].range == ('60', '100', '1')
+    assert result.items[5].range == ('18.0', '35.0', '0.5')
+    assert result.items[4].value_ids == ()
+
+
+def test_payloads_match_catalog(app_context):
+    catalog.save_category_payloads()
+    try:
+        from_payloads = build_catalog()
+        direct = build_catalog(use_payloads=False)
+        for item_id, item in direct.items.items():
+            assert from_payloads.items[item_id].value_ids == item.value_ids
+            assert from_payloads.items[item_id].range == item.range
+    finally:
+        db.session.query(models.CategoryPayload).delete()
+        db.session.commit()
+
+
+def test_value_display_key():
+    assert sorted([(1, 'b'), (None, 'z'), (1, 'a'), (0, 'c')], key=lambda x: value_display_key(*x)) == [
+        (0, 'c'), (1, 'a'), (1, 'b'), (None, 'z'),
+    ]
+
+
+def test_category_endpoints(client):
+    response = client.get('/api/category/add/1')
+    assert response.status_code == 200
+    items = {item['id']: item for item in response.json['items']}
+    assert [v['id'] for v in items[2]['values']] == [5, 4, 3]
+    assert client.get('/api/category/add/99').status_code == 404
+    assert client.get('/api/item/add/99').status_code == 404
+    assert client.get('/api/value/add/9999').status_code == 404
+    page = client.get('/api/item/3/values?offset=1&limit=1').json
+    assert [v['id'] for v in page['values']] == [7]
+    assert page['total'] == 3 and page['next'] == '/api/item/3/values?offset=2&limit=1'
+
+
+def test_category_batch(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'VALUE_PAGE_SIZE', 2)
+    categories = client.get('/api/category/batch?ids=2,x&ids=1,99').json['categories']
+    assert [category['id'] for category in categories] == [2, 1]
+    race = next(item for item in categories[1]['items'] if item['id'] == 2)
+    assert [v['id'] for v in race['values']] == [5, 4] and race['valuesTotal'] == 3
+    assert client.get('/api/category/batch').json == {'categories': []}
+
+
+def test_payloads_table_missing(app_context, monkeypatch):
+    assert models.has_table(models.CategoryPayload)
+    monkeypatch.setattr(models, 'has_table', lambda model: False)
+    assert catalog.load_category_payloads() == {}
+
+
+def test_payloads_database_error_propagates(app_context, monkeypatch):
+    def fail(*args):
+        raise sqlalchemy.exc.OperationalError('SELECT', {}, Exception('connection lost'))
+    monkeypatch.setattr(db.session, 'query', fail)
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        catalog.load_category_payloads()
+
+
+def test_item_values_table_missing(app_context, monkeypatch):
+    monkeypatch.setattr(models, 'has_table', lambda model: model is not models.ItemValue)
+    assert load_item_values() == {}
+    result = build_catalog(use_payloads=False)
+    assert result.items[2].value_ids == ()  # loaded without the older `Item.values`
+    assert result.items[6].value_ids == (10, 9)  # not loaded: from `Variable`
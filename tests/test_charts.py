@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+from conftest import assert_same_chart
+
+from dqt_api import chart_format, views
+from dqt_api.chart_format import CHART_V2_MIMETYPE, compact_chart, legacy_chart
+from dqt_api.charts import render_chart
+
+ARG_LISTS = [
+    (('1', '2'),),
+    (('2', '4'),),
+    (('3', '6_7'), ('4', '70~90')),
+    (('5', '~22'),),
+    (('1', '1'), ('1', '2')),  # no results
+]
+
+
+def jitter_function(x, mask=0, label=''):
+    return views.jitter_and_mask(x, mask, label, True)
+
+
+@pytest.mark.parametrize('arg_list', ARG_LISTS)
+def test_aggregates_match_full_path(app_context, chart_cache, arg_list):
+    case_index, cells = views.get_case_index(), views.get_chart_cells()
+    mask = case_index.mask(arg_list)
+    mask_value = app_context.config['MASK']
+    chart = views.format_chart(
+        *render_chart(cells, cells.aggregate(cells.rows_for(mask)), jitter_function, mask_value),
+        True if mask.sum() == 0 else None, jitter_function, mask_value,
+    )
+    expected = chart_cache(True, arg_list)
+    if mask.sum() == 0:  # the stored chart for no results
+        assert chart.row_value('selected-count') == expected.row_value('selected-count') == 0
+    else:
+        assert_same_chart(chart, expected)
+
+
+def test_zeroed(app_context):
+    chart = views.get_chart_data(True, (('1', '2'),))
+    zeroed = chart.zeroed()
+    assert zeroed.row_ids == chart.row_ids and set(zeroed.row_values) == {0}
+    assert all(not counts.any() for _, counts in zeroed.series)
+    assert chart.row_value('selected-count') > 0  # unchanged
+
+
+@pytest.mark.parametrize('arg_list', [()] + ARG_LISTS)
+def test_compact_matches_legacy(app_context, arg_list):
+    chart = views.get_chart_data(True, arg_list)
+    compact = json.loads(chart_format.encode_chart(compact_chart(chart), CHART_V2_MIMETYPE))
+    subject_counts, sex_data_bl, sex_data_fu, _, _ = legacy_chart(chart)
+    strings = compact['strings']
+    rows = compact['rows']
+    assert [{'id': strings[i], 'header': strings[h], 'value': v}
+            for i, h, v in zip(rows['id'], rows['header'], rows['value'])] == subject_counts
+    for key, sex_data in (('age_bl', sex_data_bl), ('age_fu', sex_data_fu)):
+        assert [strings[i] for i in compact[key]['labels']] == sex_data['labels']
+        assert [{'label': strings[s], 'data': d} for s, d in zip(compact[key]['series'], compact[key]['data'])] \
+            == sex_data['datasets']
+
+
+def test_chart_endpoint_formats(client):
+    legacy = client.get('/api/filter/chart?1=2').json
+    assert 'Accept' in client.get('/api/filter/chart?1=2').vary
+    for response in (client.get('/api/filter/chart?1=2&format=v2'),
+                     client.get('/api/filter/chart?1=2', headers={'Accept': CHART_V2_MIMETYPE})):
+        assert response.status_code == 200
+        assert response.mimetype == CHART_V2_MIMETYPE
+        compact = json.loads(response.get_data())
+        strings = compact['strings']
+        assert [strings[i] for i in compact['rows']['id']] == [row['id'] for row in legacy['subject_counts']]
+        assert compact['age_bl']['data'] == np.array([row[1:] for row in legacy['age_bl_g'][1:]]).T.tolist()
+    assert client.get('/api/filter/chart?1=2&format=json').json == legacy
+
+
+def test_chart_endpoint_bad_input(client, monkeypatch):
+    assert client.get('/api/filter/chart?format=xml').status_code == 400
+    assert client.get('/api/filter/chart?4=x~').status_code == 400
+    assert client.get('/api/filter/chart?4=x~&format=v2').status_code == 400
+    assert client.get('/api/filter/chart?1=a').status_code == 400
+    assert client.get('/api/filter/chart?x=1&format=v2').status_code == 400
+    monkeypatch.setattr(chart_format, 'msgpack', None)
+    assert client.get('/api/filter/chart?format=msgpack').status_code == 406
+
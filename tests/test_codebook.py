@@ -0,0 +1,71 @@
+import csv
+import io
+
+import pytest
+from openpyxl import load_workbook
+
+from dqt_api import views
+from dqt_api.codebook import iter_codebook_rows, iter_csv
+
+ITEM_IDS = {'sex': 1, 'race': 2, 'dx': 3, 'casi': 4, 'bmi': 5, 'smoker': 6}
+
+
+def unmasked(count, item_id, value_id):
+    return count
+
+
+def test_rows_match_case_index(app_context):
+    case_index = views.get_case_index()
+    mask = case_index.mask((('1', '2'),))
+    header, *rows = iter_codebook_rows(views.get_catalog(), case_index, unmasked, mask)
+    assert header[-2:] == ['subjects', 'selected']
+    value_ids = {}
+    for row in rows:
+        value_ids.setdefault(row[2], []).append(row[3])
+        value_mask = case_index.filter_mask(ITEM_IDS[row[2]], str(row[3]))
+        assert row[6] == value_mask.sum()
+        assert row[7] == (value_mask & mask).sum()
+    assert value_ids['race'] == [5, 4, 3]  # display order
+    assert value_ids['smoker'] == [10, 9]
+    casi = [float(row[4]) for row in rows if row[2] == 'casi']
+    assert casi == sorted(casi)
+
+
+def test_csv_chunks():
+    rows = [['a', 1], ['b', 2], ['c', 3]]
+    chunks = list(iter_csv(rows, chunk_rows=2))
+    assert len(chunks) == 2
+    assert b''.join(chunks) == b''.join(iter_csv(rows))
+    assert list(csv.reader(io.StringIO(b''.join(chunks).decode('utf8')))) == [['a', '1'], ['b', '2'], ['c', '3']]
+
+
+def read_csv(response):
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_codebook_endpoint(app, client):
+    response = client.get('/api/codebook')
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    header, *rows = read_csv(response)
+    assert header[-1] == 'subjects'
+    with app.app_context():
+        case_index = views.get_case_index()
+        for row in rows:
+            item_id, value_id = ITEM_IDS[row[2]], int(row[3])
+            count = int(case_index.filter_mask(item_id, str(value_id)).sum())
+            expected = views.jitter_and_mask(count, app.config['MASK'], f'facet-{item_id}-{value_id}') if count else 0
+            assert int(row[6]) == expected
+
+    filtered = read_csv(client.get('/api/codebook?1=2&format=csv'))
+    assert filtered[0][-1] == 'selected'
+    sex = {row[3]: row[6:] for row in filtered[1:] if row[2] == 'sex'}
+    assert sex['2'][0] == sex['2'][1] and sex['1'][1] == '0'
+
+    workbook = load_workbook(io.BytesIO(client.get('/api/codebook?format=xlsx').get_data()), read_only=True)
+    xlsx_rows = [['' if cell is None else str(cell) for cell in row] for row in workbook['codebook'].values]
+    assert xlsx_rows == [header] + rows
+
+
+@pytest.mark.parametrize('query', ['?format=pdf', '?4=x~', '?1=a'])
+def test_codebook_bad_input(client, query):
+    assert client.get(f'/api/codebook{query}').status_code == 400
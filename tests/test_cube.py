@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from conftest import assert_same_chart
+
+from dqt_api import views
+from dqt_api.cube import build_cube
+
+ARG_LISTS = [
+    (('1', '1'),),
+    (('2', '3_5'),),
+    (('1', '2'), ('2', '4')),
+    (('1', '1'), ('1', '2')),  # no results
+    (('1', '1_2'), ('1', '2')),
+    (('2', '999'),),
+    (('1', '1~2'),),  # not numeric: no values selected
+]
+
+
+@pytest.fixture()
+def cube(app_context):
+    return build_cube(views.get_case_index(), views.get_chart_cells(), views.get_age_step(), (1, 3, 2))
+
+
+def test_items_with_several_values_skipped(cube):
+    assert cube.requested_items == (1, 3, 2)
+    assert cube.items == (1, 2)
+    assert cube.aggregates.shape[:2] == cube.cases.shape == (3, 4)  # values and a slot for none
+
+
+@pytest.mark.parametrize('arg_list', ARG_LISTS)
+def test_lookup_matches_selection(cube, arg_list):
+    case_index, cells = views.get_case_index(), views.get_chart_cells()
+    mask = case_index.mask(arg_list)
+    selected, aggregates = cube.lookup(case_index, arg_list)
+    assert selected == mask.sum()
+    np.testing.assert_array_equal(aggregates, cells.aggregate(cells.rows_for(mask)))
+
+
+def test_lookup_not_answered(cube):
+    case_index = views.get_case_index()
+    assert cube.lookup(case_index, (('1', '1'), ('4', '70~80'))) is None
+    assert cube.lookup(case_index, (('3', '6'),)) is None
+    with pytest.raises(ValueError):
+        cube.lookup(case_index, (('1', 'x'),))
+
+
+def test_budget_skips_items(app_context):
+    case_index, cells = views.get_case_index(), views.get_chart_cells()
+    cell_bytes = (len(cells.codes) * 3 * cells.size + 1) * 8
+    cube = build_cube(case_index, cells, views.get_age_step(), (2, 1), max_bytes=cell_bytes * 5)
+    assert cube.items == (2,)
+    empty = build_cube(case_index, cells, views.get_age_step(), (3, 99))
+    assert empty.items == () and empty.lookup(case_index, (('3', '6'),)) is None
+
+
+@pytest.mark.parametrize('arg_list', ARG_LISTS + [(('1', '2'), ('5', '~25'))])
+def test_chart_matches_full_path(app, cube, chart_cache, monkeypatch, arg_list):
+    expected = chart_cache(True, arg_list)
+    chart_cache.cache_clear()
+    monkeypatch.setitem(app.config, 'CUBE', cube)
+    assert_same_chart(chart_cache(True, arg_list), expected)
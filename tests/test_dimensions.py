@@ -0,0 +1,109 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+import sqlalchemy
+
+from dqt_api import db, models, views
+from dqt_api.dimensions import bin_codes, build_dimension_frame, load_dimensions
+
+
+def test_bin_codes():
+    codes, labels = bin_codes(np.array([np.nan, 59, 60, 69.9, 70, 89, 90, 99, 120]), 60, 100, 10)
+    assert labels == ['60-69', '70-79', '80-89', '90+']
+    assert codes.tolist() == [-1, -1, 0, 0, 1, 2, 3, 3, 3]
+
+
+def data_model_rows(case_ids):
+    case_ids = set(case_ids.tolist())
+    return [row for row in db.session.query(models.DataModel) if row.case in case_ids]
+
+
+def test_crosstab_matches_rows(app_context):
+    frame = views.get_dimension_frame()
+    counts, labels = frame.crosstab(('sex', 'enrollment'))
+    expected = Counter((row.sex, row.enrollment) for row in db.session.query(models.DataModel)
+                       if row.enrollment is not None)  # missing labels are not counted
+    assert labels == (['female', 'male'], ['active', 'deceased', 'inactive'])
+    assert {(labels[0][i], labels[1][j]): int(count) for (i, j), count in np.ndenumerate(counts)} == expected
+
+
+def test_crosstab_endpoint(app, client):
+    response = client.get('/api/filter/crosstab?rows=sex&cols=age_bl&1=2&2=3_4')
+    assert response.status_code == 200
+    data = response.json
+    assert data['dimensions'] == ['sex', 'age_bl']
+    assert data['labels'] == [['female', 'male'], ['60-69', '70-79', '80-89', '90+']]
+    with app.app_context():
+        case_ids = views.get_selected_case_ids((('1', '2'), ('2', '3_4')))
+        rows = data_model_rows(case_ids)
+    expected = Counter()
+    for row in rows:
+        codes, age_labels = bin_codes(np.array([np.nan if row.age_bl is None else row.age_bl]), 60, 100, 10)
+        if codes[0] >= 0:
+            expected[row.sex, age_labels[codes[0]]] += 1
+    for i, sex in enumerate(data['labels'][0]):
+        for j, age in enumerate(data['labels'][1]):
+            count = expected[sex, age]
+            if count:
+                count = views.jitter_and_mask(count, app.config['MASK'], f'crosstab-{sex}|{age}', True)
+            assert data['counts'][i][j] == count
+
+
+@pytest.mark.parametrize('query', [
+    '',
+    '?rows=sex&cols=sex',
+    '?rows=race',
+    '?rows=sex&cols=enrollment&layers=age_bl&1=a',  # invalid filter
+    '?rows=sex&4=x~',
+])
+def test_crosstab_bad_input(client, query):
+    assert client.get(f'/api/filter/crosstab{query}').status_code == 400
+
+
+def test_three_way_crosstab(client):
+    data = client.get('/api/filter/crosstab?rows=sex&cols=enrollment&layers=age_fu').json
+    assert np.array(data['counts']).shape == (2, 3, 4)
+
+
+def test_extra_dimensions(app_context):
+    db.session.add_all([
+        models.DimensionLabel(dimension='site', code=0, label='north'),
+        models.DimensionLabel(dimension='site', code=1, label='south'),
+        models.DimensionLabel(dimension='sex', code=0, label='x'),  # duplicates a DataModel column
+        models.CaseDimension(case=1, dimension='site', code=1),
+        models.CaseDimension(case=2, dimension='site', code=0),
+        models.CaseDimension(case=999, dimension='site', code=0),  # not in DataModel
+    ])
+    try:
+        frame = build_dimension_frame()
+        assert frame.dimensions == ('sex', 'enrollment', 'site', 'age_bl', 'age_fu')
+        assert frame.labels['sex'] == ['female', 'male']
+        counts, labels = frame.crosstab(('site',))
+        assert labels == (['north', 'south'],) and counts.tolist() == [1, 1]
+        assert frame.columns['site'][:3].tolist() == [1, 0, -1]
+    finally:
+        db.session.rollback()
+
+
+def test_extra_dimension_codes_must_be_consecutive(app_context):
+    db.session.add(models.DimensionLabel(dimension='site', code=1, label='south'))
+    try:
+        with pytest.raises(ValueError):
+            build_dimension_frame()
+    finally:
+        db.session.rollback()
+
+
+def test_extra_dimension_tables_missing(app_context, monkeypatch):
+    monkeypatch.setattr(models, 'has_table', lambda model: model is not models.CaseDimension)
+    assert load_dimensions(np.array([1, 2])) == {}
+    assert build_dimension_frame().dimensions == ('sex', 'enrollment', 'age_bl', 'age_fu')
+
+
+def test_extra_dimension_database_error_propagates(app_context, monkeypatch):
+    def fail(*args):
+        raise sqlalchemy.exc.OperationalError('SELECT', {}, Exception('connection lost'))
+    monkeypatch.setattr(db.session, 'query', fail)
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        load_dimensions(np.array([1, 2]))
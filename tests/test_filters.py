@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from dqt_api import views
+
+
+@pytest.mark.parametrize('query', ['', '1=2&4=70~90', '2=5', '3=6_7&5=~25', '4=~', '2=999', '1=1&2=4&3=8&4=95~'])
+def test_count_matches_chart(app, client, monkeypatch, query):
+    chart = client.get(f'/api/filter/chart?{query}').json
+    selected = next(row['value'] for row in chart['subject_counts'] if row['id'] == 'selected-count')
+
+    def fail(cases):
+        raise AssertionError('count read DataModel')
+    monkeypatch.setattr(views, 'load_cases_to_polars', fail)
+    views.get_filter_count.cache_clear()
+    assert client.get(f'/api/filter/count?{query}').json == {'count': selected}
+
+
+def test_count_bad_input(client):
+    for query in ('1=a', '1=1_a', 'x=1', '4=x~'):
+        assert client.get(f'/api/filter/count?{query}').status_code == 400
+
+
+def expected_facets(app, arg_list):
+    """Unjittered facets from selecting the cases of the other filters for each item"""
+    case_index = views.get_case_index()
+    facets = {}
+    for item_id in (1, 2, 3, 6):
+        mask = case_index.mask(tuple((key, val) for key, val in arg_list if int(key) != item_id))
+        mask = np.ones(case_index.size, dtype=bool) if mask is None else mask
+        facets[str(item_id)] = {}
+        for value_id in views.get_catalog().items[item_id].value_ids:
+            count = int((case_index.filter_mask(item_id, str(value_id)) & mask).sum())
+            if count:
+                count = views.jitter_and_mask(count, app.config['MASK'], f'facet-{item_id}-{value_id}', True)
+            facets[str(item_id)][str(value_id)] = count
+    return facets
+
+
+def test_facets_endpoint(app, client):
+    for query, arg_list in (('', ()),
+                            ('?1=1', (('1', '1'),)),
+                            ('?1=1&2=3_4&4=70~90', (('1', '1'), ('2', '3_4'), ('4', '70~90')))):
+        facets = client.get(f'/api/filter/facets{query}').json['facets']
+        with app.app_context():
+            assert facets == expected_facets(app, arg_list)
+    assert set(facets) == {'1', '2', '3', '6'}  # categorical items only
+
+
+def test_facets_ignore_own_filter(client):
+    unfiltered = client.get('/api/filter/facets').json['facets']
+    filtered = client.get('/api/filter/facets?1=1').json['facets']
+    assert filtered['1'] == unfiltered['1']
+    assert filtered['2'] != unfiltered['2']
+    assert client.get('/api/filter/facets?2=999').json['facets']['1'] == {'1': 0, '2': 0}
+
+
+def test_facets_bad_input(client):
+    assert client.get('/api/filter/facets?4=x~').status_code == 400
+    assert client.get('/api/filter/facets?1=a').status_code == 400
+
+
+def test_compare_matches_charts(client):
+    cohorts = [{'1': '1'}, {'1': '2', '4': '70~90'}, {}, {'2': '999'}]
+    response = client.post('/api/filter/compare', json={'cohorts': cohorts})
+    assert response.status_code == 200
+    charts = response.json['cohorts']
+    assert len(charts) == len(cohorts)
+    for cohort, chart in zip(cohorts, charts):
+        query = '&'.join(f'{key}={val}' for key, val in cohort.items())
+        assert chart == client.get(f'/api/filter/chart?{query}').json
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {},
+    {'cohorts': {'1': '1'}},
+    {'cohorts': ['1=1']},
+    {'cohorts': [{'1': '1'}] * 6},  # more than `COMPARE_MAX_COHORTS`
+    {'cohorts': [{'4': 'x~'}]},
+    {'cohorts': [{'1': 'a'}]},
+])
+def test_compare_bad_input(client, body):
+    assert client.post('/api/filter/compare', json=body).status_code == 400
+
+
+def test_export_endpoint(client):
+    export = client.get('/api/filter/export?2=3_4&4=70~80&5=~20').json['filterstring']
+    assert export == '(race IN (white, black)) AND (casi >= 70 AND casi <= 80) AND (bmi <= 20)'
+    assert client.get('/api/filter/export?5=~20&4=70~80&2=3_4').json['filterstring'] == export  # any order
+    assert client.get('/api/filter/export?1=2').json['filterstring'] == '(sex = male)'
+    assert client.get('/api/filter/export').json['filterstring'] == ''
+    assert client.get('/api/filter/export?99=1').status_code == 404
+    assert client.get('/api/filter/export?1=999').status_code == 404
+    assert client.get('/api/filter/export?x=1').status_code == 404
+
+
+def test_histogram_endpoint(app, client):
+    data = client.get('/api/item/4/histogram?1=2').json
+    assert data['edges'] == list(range(60, 101))
+    with app.app_context():
+        case_index = views.get_case_index()
+        mask = case_index.mask((('1', '2'),))
+        for i, count in enumerate(data['counts']):
+            low, high = data['edges'][i], data['edges'][i + 1] - 1
+            if i == len(data['counts']) - 1:
+                high += 1  # the last bin includes the end of the range
+            expected = int((case_index.filter_mask(4, f'{low}~{high}') & mask).sum())
+            if expected:
+                expected = views.jitter_and_mask(expected, app.config['MASK'], f'histogram-4-{i}', True)
+            assert count == expected
+
+
+def test_histogram_edges(app_context, monkeypatch):
+    assert views.get_histogram_edges('18.0', '35.0', '0.5').tolist() == np.arange(18.0, 35.5, 0.5).tolist()
+    monkeypatch.setitem(app_context.config, 'HISTOGRAM_MAX_BINS', 10)
+    assert views.get_histogram_edges('60', '100', '1').tolist() == list(range(60, 101, 4))
+    with pytest.raises(ValueError):
+        views.get_histogram_edges('10', '0', '1')
+
+
+def test_histogram_bad_input(client):
+    assert client.get('/api/item/1/histogram').status_code == 404  # not numeric
+    assert client.get('/api/item/99/histogram').status_code == 404
+    assert client.get('/api/item/4/histogram?4=x~').status_code == 400
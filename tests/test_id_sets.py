@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from dqt_api import db, id_sets, models
+from dqt_api.id_sets import execute_with_ids, get_transport
+from dqt_api.pl_utils import load_cases_to_polars
+
+CASE_IDS = np.array([1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 301, 999], dtype=np.int64)
+
+
+@pytest.fixture(params=['temp_table', 'in'])
+def transport(request, app_context, monkeypatch):
+    monkeypatch.setitem(app_context.config, 'ID_SET_TRANSPORT', request.param)
+    monkeypatch.setattr(id_sets, 'IN_CHUNK_SIZE', 5)
+    monkeypatch.setattr(id_sets, 'INSERT_CHUNK_SIZE', 5)
+    monkeypatch.setattr(id_sets, 'FETCH_SIZE', 4)
+    return request.param
+
+
+def test_rows_match_direct_query(transport):
+    statement = select(models.DataModel.case, models.DataModel.sex)
+    rows = sorted(row for partition in execute_with_ids(statement, models.DataModel.case, CASE_IDS)
+                  for row in partition)
+    expected = sorted(tuple(row) for row in db.session.execute(
+        statement.where(models.DataModel.case.in_(CASE_IDS.tolist()))))
+    assert rows == expected and len(rows) == len(CASE_IDS) - 1
+    assert list(execute_with_ids(statement, models.DataModel.case, CASE_IDS[:0])) == []
+
+
+def test_temp_table_emptied(transport):
+    statement = select(models.DataModel.case)
+    for ids in (CASE_IDS, CASE_IDS[:3]):  # the second set replaces the first
+        rows = [row[0] for partition in execute_with_ids(statement, models.DataModel.case, ids) for row in partition]
+        assert sorted(rows) == [x for x in ids.tolist() if x <= 301]
+
+
+def test_load_cases_to_polars(transport):
+    df = load_cases_to_polars(CASE_IDS).sort('case')
+    assert df['case'].to_list() == CASE_IDS[:-1].tolist()
+    row = db.session.get(models.DataModel, 13)
+    assert df.filter(df['case'] == 13)['sex'].cast(str).to_list() == [row.sex]
+    assert load_cases_to_polars(None).height == 0
+
+
+def test_default_and_invalid_transport(app_context, monkeypatch):
+    monkeypatch.setitem(app_context.config, 'ID_SET_TRANSPORT', None)
+    assert get_transport() == 'temp_table'  # SQLite
+    monkeypatch.setitem(app_context.config, 'ID_SET_TRANSPORT', 'chunks')
+    with pytest.raises(ValueError):
+        get_transport()
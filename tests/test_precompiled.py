@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import json
+
+from dqt_api import db, models, precompiled, views
+from dqt_api.precompiled import PrecompiledResponse, get_precompiled, get_stamp, iter_chunks, touch_stamp
+
+
+def test_compression_threshold():
+    small = PrecompiledResponse.from_json({'a': 1})
+    assert small.gzip_body is None
+    large = PrecompiledResponse.from_json({'a': 'x' * precompiled.MIN_GZIP_SIZE})
+    assert gzip.decompress(large.gzip_body) == large.body
+    assert json.loads(large.body) == {'a': 'x' * precompiled.MIN_GZIP_SIZE}
+    assert PrecompiledResponse(large.body, compress=False).gzip_body is None
+
+
+def test_iter_chunks():
+    body = bytes(range(256)) * 10
+    chunks = list(iter_chunks(body, chunk_size=1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 560]
+    assert b''.join(chunks) == body
+
+
+def test_to_response(app):
+    compiled = PrecompiledResponse.from_json({'a': 'x' * precompiled.MIN_GZIP_SIZE})
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = compiled.to_response()
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Content-Length'] == str(len(compiled.gzip_body))
+        assert response.get_etag()[0] == compiled.etag
+    with app.test_request_context():
+        response = compiled.to_response()
+        assert 'Content-Encoding' not in response.headers
+        assert b''.join(response.response) == compiled.body
+    with app.test_request_context(headers={'If-None-Match': f'"{compiled.etag}"'}):
+        assert compiled.to_response().status_code == 304
+
+
+def test_get_precompiled_rebuilds_for_new_key():
+    calls = []
+
+    def builder():
+        calls.append(1)
+        return len(calls)
+
+    assert get_precompiled('test', 1, builder) == 1
+    assert get_precompiled('test', 1, builder) == 1
+    assert get_precompiled('test', 2, builder) == 2
+    assert get_precompiled('test', 1, builder) == 3  # only the latest key is kept
+    assert len(calls) == 3
+
+
+def test_dictionary_endpoint(client):
+    response = client.get('/api/dictionary/get')
+    assert response.status_code == 200 and 'data_entries' in response.json
+    assert client.get('/api/dictionary/get', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_stamp_recompiles_tabs_and_comments(app, client):
+    before = client.get('/api/tabs')
+    assert before.json == {'tabs': [{'header': 'About', 'lines': [{'type': 'text', 'text': 'About the cohort.'}]}]}
+    assert client.get('/api/comments/table').json['comments'] == ['Counts are jittered.']
+    assert client.get('/api/comments/other').json['comments'] == []
+    with app.app_context():
+        db.session.add(models.TabData(header='About', line=2, text_type='text', text='More.', order=1))
+        db.session.add(models.Comment(location='table', line=2, comment='Small counts are masked.'))
+        db.session.commit()
+    try:
+        assert client.get('/api/tabs').get_data() == before.get_data()  # not yet recompiled
+        stamp = get_stamp('tabs')
+        touch_stamp('tabs')
+        touch_stamp('comments')
+        assert get_stamp('tabs') > stamp
+        assert client.get('/api/tabs').json['tabs'][0]['lines'][-1]['text'] == 'More.'
+        assert client.get('/api/comments/table').json['comments'][-1] == 'Small counts are masked.'
+    finally:
+        with app.app_context():
+            db.session.query(models.TabData).filter_by(line=2).delete()
+            db.session.query(models.Comment).filter_by(line=2).delete()
+            db.session.commit()
+        touch_stamp('tabs')
+        touch_stamp('comments')
+
+
+def test_data_dictionary_file(app, client):
+    assert client.get('/api/data/dictionary/get').status_code == 404
+    assert client.get('/api/data/dictionary/meta').json['checksums'][0]['value'] == 'Unavailable'
+    content = bytes(range(256)) * 40
+    with app.app_context():
+        db.session.add(models.DataFile(filename='dictionary.xlsx', file=content))  # checksum not recorded
+        db.session.commit()
+    views.get_data_dictionary_meta_info.cache_clear()
+    views.get_data_dictionary_path.cache_clear()
+    try:
+        response = client.get('/api/data/dictionary/get')
+        assert response.status_code == 200 and response.get_data() == content
+        assert 'dictionary.xlsx' in response.headers['Content-Disposition']
+        etag = hashlib.md5(content).hexdigest()
+        assert response.get_etag()[0] == etag
+        assert client.get('/api/data/dictionary/meta').json['checksums'][0]['value'] == etag
+        partial = client.get('/api/data/dictionary/get', headers={'Range': 'bytes=100-199'})
+        assert partial.status_code == 206 and partial.get_data() == content[100:200]
+        assert client.get('/api/data/dictionary/get', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    finally:
+        with app.app_context():
+            db.session.query(models.DataFile).delete()
+            db.session.commit()
+        views.get_data_dictionary_meta_info.cache_clear()
+        views.get_data_dictionary_path.cache_clear()
@@ -0,0 +1,58 @@
+from whoosh.fields import ID, TEXT, Schema
+from whoosh.filedb.filestore import RamStorage
+
+from dqt_api.flask_whooshee import SearcherPool
+
+
+def make_index(*names):
+    index = RamStorage().create_index(Schema(id=ID(stored=True), name=TEXT))
+    add_documents(index, *names)
+    return index
+
+
+def add_documents(index, *names):
+    writer = index.writer()
+    for name in names:
+        writer.add_document(id=name, name=name)
+    writer.commit()
+
+
+def test_searcher_reused_until_index_changes():
+    index = make_index('a')
+    pool = SearcherPool(index)
+    with pool.searcher() as first:
+        pass
+    with pool.searcher() as second:
+        assert second is first
+    add_documents(index, 'b')
+    with pool.searcher() as refreshed:
+        assert refreshed.doc_count() == 2
+    metrics = pool.metrics()
+    assert (metrics['opens'], metrics['reuses'], metrics['refreshes']) == (1, 1, 1)
+
+
+def test_searcher_in_use_not_closed(monkeypatch):
+    index = make_index('a')
+    pool = SearcherPool(index)
+    closed = []
+    with pool.searcher() as in_use:
+        monkeypatch.setattr(in_use, 'close', lambda: closed.append(in_use))
+        add_documents(index, 'b')
+        with pool.searcher() as refreshed:
+            assert refreshed is not in_use and refreshed.doc_count() == 2
+        assert in_use.doc_count() == 1 and not closed  # still usable
+        pool.close()
+        assert not closed
+    assert closed == [in_use]  # by its last user
+    assert pool._users == {}
+
+
+def test_search_endpoint(client):
+    assert client.get('/api/search?query=white').json['search'] == [
+        {'type': 'value', 'id': 3, 'name': 'white', 'description': 'Race', 'categoryId': 1, 'itemId': 2},
+    ]
+    assert [x['id'] for x in client.get('/api/search?query=Race').json['search'] if x['type'] == 'item'] == [2]
+    assert [x['id'] for x in client.get('/api/search?query=Demog').json['search']] == [1]
+    assert client.get('/api/search?query=ab').get_data(as_text=True).startswith('Invalid search')
+    metrics = client.get('/api/search/metrics').json
+    assert metrics['category']['opens'] == 1
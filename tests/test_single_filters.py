@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from conftest import assert_same_chart
+
+from dqt_api import views
+from dqt_api.single_filters import build_single_filter_charts
+
+FILTERS = [
+    (1, '1'),
+    (2, '3_5'),  # not contiguous
+    (2, '999'),  # no such value
+    (3, '6'),  # one value of an item with several values per case
+    (4, '70~80'),
+    (4, '~'),
+    (5, '~20'),
+    (5, '30.5~'),
+    (6, '9_10'),
+]
+
+
+@pytest.fixture()
+def precomputed(app_context):
+    return build_single_filter_charts(views.get_case_index(), views.get_chart_cells(), views.get_age_step())
+
+
+@pytest.mark.parametrize('item_id, val', FILTERS)
+def test_lookup_matches_selection(precomputed, item_id, val):
+    case_index, cells = views.get_case_index(), views.get_chart_cells()
+    mask = case_index.filter_mask(item_id, val)
+    selected, aggregates = precomputed.lookup(case_index, item_id, val)
+    assert selected == mask.sum()
+    np.testing.assert_array_equal(aggregates, cells.aggregate(cells.rows_for(mask)))
+
+
+def test_lookup_not_answered(precomputed):
+    case_index = views.get_case_index()
+    assert not precomputed.is_single_valued(3)
+    assert precomputed.is_single_valued(2)
+    assert precomputed.lookup(case_index, 3, '6_7') is None
+    assert precomputed.lookup(case_index, 99, '1') is None
+    with pytest.raises(ValueError):
+        precomputed.lookup(case_index, 4, 'x~')
+
+
+def test_budget_skips_items(app_context):
+    case_index, cells = views.get_case_index(), views.get_chart_cells()
+    full = build_single_filter_charts(case_index, cells, views.get_age_step())
+    row_bytes = full.cumulative.shape[1] * full.cumulative.itemsize
+    max_bytes = row_bytes * 10  # only items with fewer than 10 values
+    limited = build_single_filter_charts(case_index, cells, views.get_age_step(), max_bytes)
+    assert limited.cumulative.nbytes <= max_bytes
+    assert 1 in limited.item_rows and 4 not in limited.item_rows
+    assert limited.lookup(case_index, 4, '70~80') is None
+    selected, aggregates = limited.lookup(case_index, 1, '2')
+    np.testing.assert_array_equal(aggregates, full.lookup(case_index, 1, '2')[1])
+
+
+def test_fractional_followup_skips_table(app_context, monkeypatch):
+    case_index, cells = views.get_case_index(), views.get_chart_cells()
+    monkeypatch.setattr(cells, 'followup', cells.followup + 0.5)
+    precomputed = build_single_filter_charts(case_index, cells, views.get_age_step())
+    assert precomputed.item_rows == {}
+    assert precomputed.lookup(case_index, 1, '1') is None
+
+
+@pytest.mark.parametrize('item_id, val', FILTERS + [(3, '6_7')])
+def test_chart_matches_full_path(app, precomputed, chart_cache, monkeypatch, item_id, val):
+    arg_list = ((str(item_id), val),)
+    expected = chart_cache(True, arg_list)
+    chart_cache.cache_clear()
+    monkeypatch.setitem(app.config, 'SINGLE_FILTERS', precomputed)
+    assert_same_chart(chart_cache(True, arg_list), expected)